@@ -103,13 +103,20 @@ class _ClusterTaggableManager(_TaggableManager):
         else:
             tag_objs = self._to_tag_model_instances(tags)
 
-        # Now write these to the relation
+        # Now write these to the relation, in a single add() call rather than one
+        # per tag, skipping the tags it already has
         tagged_item_manager = self.get_tagged_item_manager()
+        existing_tag_ids = {
+            tagged_item.tag_id for tagged_item in tagged_item_manager.all()
+        }
+        tagged_items = []
         for tag in tag_objs:
-            if not tagged_item_manager.filter(tag=tag):
-                # make an instance of the self.through model and add it to the relation
-                tagged_item = self.through(tag=tag)
-                tagged_item_manager.add(tagged_item)
+            if tag.pk not in existing_tag_ids:
+                existing_tag_ids.add(tag.pk)
+                # make an instance of the self.through model to add to the relation
+                tagged_items.append(self.through(tag=tag))
+        if tagged_items:
+            tagged_item_manager.add(*tagged_items)
 
     @require_instance_manager
     def remove(self, *tags):
@@ -1,9 +1,13 @@
 from __future__ import unicode_literals
 
+import itertools
+import weakref
+
 from django import VERSION as DJANGO_VERSION
 from django.core import checks
 from django.db import IntegrityError, connections, router
-from django.db.models import CASCADE
+from django.db.models import CASCADE, Model, prefetch_related_objects
+from django.db.models.signals import pre_save
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 from django.utils.functional import cached_property
 
@@ -13,9 +17,476 @@ from django.db.models.fields.related import (
 )
 
 
-from modelcluster.utils import sort_by_fields
+from modelcluster.utils import (
+    diff_object_lists,
+    get_changed_field_names,
+    get_field_values_snapshot,
+    get_object_key,
+    ObjectPositions,
+    remove_objects,
+    replace_or_append_objects,
+    sort_by_fields,
+)
+
+from modelcluster.queryset import (
+    FakeQuerySet,
+    FakeQuerySetIndexes,
+    get_index_field_names,
+)
+
+
+# source of the numbers returned by ClusterableModel.relation_generation; these
+# increase across all relations, so that the highest generation in a cluster of
+# objects changes whenever any of its relations does
+relation_generations = itertools.count(1)
+
+
+def get_relation_generation(instance, relation_name):
+    """
+    Return the number recorded by bump_relation_generation() for the named relation
+    of the given instance, or 0 if it has not been modified
+    """
+    return getattr(instance, "_cluster_related_generations", {}).get(relation_name, 0)
+
+
+def bump_relation_generation(instance, relation_name):
+    """
+    Record that the named relation of the given instance has been modified
+    """
+    generations = getattr(instance, "_cluster_related_generations", {})
+    # replace the dict rather than updating it, as copies of the instance may share it
+    instance._cluster_related_generations = {
+        **generations,
+        relation_name: next(relation_generations),
+    }
+
+
+def add_to_relation_object_list(instance, relation_name, items, new_items):
+    """
+    Add new_items to items, the in-memory object list for the named relation of the
+    given instance, replacing any objects in it that are equal to them, and record
+    that the relation has been modified. The ObjectPositions index of the list is
+    kept on the instance, so that a series of calls only indexes the list once
+    """
+    generation = get_relation_generation(instance, relation_name)
+    try:
+        positions, version = instance._cluster_related_positions[relation_name]
+    except (AttributeError, KeyError):
+        positions = None
+    # any other change to the relation through its manager changes its generation;
+    # changes made directly to the list are assumed to change its length
+    if (
+        positions is None
+        or positions.items is not items
+        or version != (generation, len(items))
+    ):
+        positions = ObjectPositions(items)
+
+    positions.replace_or_append(new_items)
+
+    bump_relation_generation(instance, relation_name)
+    version = (get_relation_generation(instance, relation_name), len(items))
+    # replace the dict rather than updating it, as copies of the instance may share it
+    instance._cluster_related_positions = {
+        **getattr(instance, "_cluster_related_positions", {}),
+        relation_name: (positions, version),
+    }
+
+
+def mark_relation_unsorted(instance, relation_name, ordering):
+    """
+    Record that the in-memory object list for the named relation of the given
+    instance may be out of order, and needs sorting by the given ordering (a list
+    of field names, as for Meta.ordering) before it is next read
+    """
+    try:
+        instance._cluster_related_unsorted[relation_name] = ordering
+    except AttributeError:
+        instance._cluster_related_unsorted = {relation_name: ordering}
+
+
+def pop_relation_unsorted(instance, relation_name):
+    """
+    Return the ordering that the in-memory object list for the named relation of the
+    given instance needs sorting by, or None if it does not need sorting, and clear
+    that record
+    """
+    try:
+        return instance._cluster_related_unsorted.pop(relation_name, None)
+    except AttributeError:
+        return None
+
+
+def sort_pending_relation(instance, relation_name, items):
+    """
+    Sort items, the in-memory object list for the named relation of the given
+    instance, if add() or set() have left it out of order. Sorting is deferred until
+    the list is read, so that building up a relation with many add() calls only
+    sorts it once
+    """
+    ordering = pop_relation_unsorted(instance, relation_name)
+    if ordering and len(items) > 1:
+        sort_by_fields(items, ordering)
+    return items
+
+
+def get_relation_index_version(instance, relation_name):
+    """
+    Return a value that changes whenever the in-memory object list for the named
+    relation of the given instance is modified or reordered, for versioning the
+    FakeQuerySetIndexes built over it
+    """
+    generation = get_relation_generation(instance, relation_name)
+    # a pending sort reorders the list in place without modifying it
+    unsorted = relation_name in getattr(instance, "_cluster_related_unsorted", {})
+    return (generation, unsorted)
+
+
+def can_save_changed_fields_only(model):
+    """
+    Return whether committing a child relation can save an object of the given model
+    that was loaded from the database with update_fields set to just the fields
+    that have changed since. That is not the case if saving the object may set
+    further fields itself - as an overridden save() method or a pre_save signal
+    handler might, e.g. to derive a slug from a title - since those would then not
+    be written. Such methods and handlers are detected; a model whose fields derive
+    their values in other ways (e.g. in a custom field's pre_save()) should set
+    cluster_save_changed_fields_only = False, to have its objects saved in full.
+    """
+    from modelcluster.models import ClusterableModel
+
+    return (
+        getattr(model, "cluster_save_changed_fields_only", True)
+        and model.save in (Model.save, ClusterableModel.save)
+        and not pre_save.has_listeners(model)
+    )
+
+
+def get_prefetched_objects(instance, relation_name):
+    """
+    Return a list of the objects loaded for the named relation of the given instance
+    by prefetch_related(), or None if the relation has not been prefetched
+    """
+    try:
+        queryset = instance._prefetched_objects_cache[relation_name]
+    except (AttributeError, KeyError):
+        return None
+    return list(queryset)
+
+
+def discard_prefetched_objects(instance, relation_name):
+    """
+    Discard the objects loaded for the named relation of the given instance by
+    prefetch_related(), which are out of date once the relation has been committed
+    """
+    try:
+        instance._prefetched_objects_cache.pop(relation_name, None)
+    except AttributeError:
+        pass
 
-from modelcluster.queryset import FakeQuerySet
+
+class ClusterSiblings:
+    """
+    The model instances loaded together by a ClusterableQuerySet, so that relations
+    with ParentalKey.auto_prefetch set can be loaded for all of them at once. The
+    instances are held by weak reference, so that keeping one of them does not keep
+    all of them alive.
+    """
+
+    def __init__(self, instances):
+        self.instance_refs = [weakref.ref(instance) for instance in instances]
+        # names of the relations being prefetched; prefetch_related_objects() reads
+        # each instance's relation, which must not start another prefetch
+        self.prefetching = set()
+
+    def prefetch(self, instance, relation_name):
+        """
+        Load the named relation with a single prefetch query for the given instance
+        and any of its siblings that have not loaded it already
+        """
+        if relation_name in self.prefetching or not self._needs_fetch(
+            instance, relation_name
+        ):
+            return
+
+        instances = []
+        for instance_ref in self.instance_refs:
+            sibling = instance_ref()
+            if sibling is not None and self._needs_fetch(sibling, relation_name):
+                instances.append(sibling)
+        if len(instances) < 2:
+            return
+
+        self.prefetching.add(relation_name)
+        try:
+            prefetch_related_objects(instances, relation_name)
+        finally:
+            self.prefetching.discard(relation_name)
+
+    def _needs_fetch(self, instance, relation_name):
+        # Return true if reading the named relation of the instance would query the
+        # database: it is saved, and the relation is neither prefetched nor held in
+        # memory
+        return not (
+            instance.pk is None
+            or relation_name in getattr(instance, "_prefetched_objects_cache", {})
+            or relation_name in getattr(instance, "_cluster_related_objects", {})
+            or relation_name in getattr(instance, "_cluster_related_overlays", {})
+        )
+
+
+def get_pending_relations(instance):
+    """
+    Return a dict of the relations of the given instance that have uncommitted
+    in-memory changes, mapping each relation name to the objects that committing it
+    will write: its full object list, or the objects added to its RelationOverlay
+    """
+    pending = dict(getattr(instance, "_cluster_related_objects", {}))
+    for name, overlay in getattr(instance, "_cluster_related_overlays", {}).items():
+        pending[name] = list(overlay.added.values())
+    return pending
+
+
+class RelationOverlay:
+    """
+    The uncommitted changes to a child relation whose objects have not been loaded
+    from the database: the objects added to it (which replace any existing objects
+    with the same primary key), and the primary keys of the objects removed from it
+    """
+
+    def __init__(self):
+        # keyed by get_object_key(), in the order the objects were first added
+        self.added = {}
+        self.removed_pks = set()
+
+    def add(self, items):
+        for item in items:
+            self.added[get_object_key(item)] = item
+            if item.pk is not None:
+                self.removed_pks.discard(item.pk)
+
+    def remove(self, items):
+        for item in items:
+            self.added.pop(get_object_key(item), None)
+            if item.pk is not None:
+                self.removed_pks.add(item.pk)
+
+    def apply(self, object_list):
+        """
+        Apply the changes in place to the list of the relation's objects as loaded
+        from the database
+        """
+        if self.removed_pks:
+            object_list[:] = [
+                item for item in object_list if item.pk not in self.removed_pks
+            ]
+        replace_or_append_objects(object_list, self.added.values())
+
+
+class RelationChanges:
+    """
+    A record of the database writes needed to commit one or more deferred child
+    relations on the given model, to be performed with bulk queries
+    """
+
+    def __init__(self, model, using):
+        self.model = model
+        self.using = using
+        self.items = []
+        self.pks_to_delete = []
+        # may include objects that have a primary key, but did not belong to the
+        # relation in the database; apply() will update these if they exist elsewhere
+        self.items_to_create = []
+        self.items_to_update = []
+        self.update_fields = set()
+        # populated by apply() with the objects that were inserted
+        self.created_items = []
+
+    @cached_property
+    def all_update_fields(self):
+        return [
+            field.name
+            for field in self.model._meta.concrete_fields
+            if not field.primary_key
+        ]
+
+    def merge(self, other):
+        """
+        Add the changes from another RelationChanges record for the same model
+        and database
+        """
+        self.items.extend(other.items)
+        self.pks_to_delete.extend(other.pks_to_delete)
+        self.items_to_create.extend(other.items_to_create)
+        self.items_to_update.extend(other.items_to_update)
+        self.update_fields.update(other.update_fields)
+
+    def get_delete_queryset(self):
+        """
+        Return a queryset of the objects that have been removed, or None if there
+        are none
+        """
+        if self.pks_to_delete:
+            return self.model._base_manager.using(self.using).filter(
+                pk__in=self.pks_to_delete
+            )
+
+    def _get_unknown_pks(self):
+        # Primary keys of the objects to be created that already have one. These
+        # don't belong to the relation in the database, but may exist elsewhere
+        # (e.g. under a different parent)
+        return [item.pk for item in self.items_to_create if item.pk is not None]
+
+    def _get_writes(self, existing_pks):
+        # Return the objects to insert, the objects to update and the names of
+        # the fields to update, given the subset of _get_unknown_pks() that exist in
+        # the database. As with save(), the existing ones are updated rather than
+        # inserted
+        items_to_create = self.items_to_create
+        items_to_update = self.items_to_update
+        update_fields = self.update_fields
+
+        if existing_pks:
+            items_to_create = [
+                item for item in self.items_to_create if item.pk not in existing_pks
+            ]
+            items_to_update = items_to_update + [
+                item
+                for item in self.items_to_create
+                if item.pk is not None and item.pk in existing_pks
+            ]
+            update_fields = set(self.all_update_fields)
+
+        if not items_to_update:
+            return items_to_create, items_to_update, []
+
+        # preserve the model's field order, for predictable SQL
+        fields = [
+            self.model._meta.get_field(field_name)
+            for field_name in self.all_update_fields
+            if field_name in update_fields
+        ]
+        for item in items_to_update:
+            # bulk_update() does not call pre_save, which is responsible for
+            # things like auto_now timestamps and committing uploaded files
+            for field in fields:
+                field.pre_save(item, False)
+        return items_to_create, items_to_update, [field.name for field in fields]
+
+    @cached_property
+    def can_upsert(self):
+        # bulk_create() calls pre_save(add=True) on every field of every object, which
+        # would reset auto_now_add values on the objects that already exist
+        return connections[
+            self.using
+        ].features.supports_update_conflicts_with_target and not any(
+            getattr(field, "auto_now_add", False)
+            for field in self.model._meta.concrete_fields
+        )
+
+    def _get_upserts(self):
+        # Return the objects to insert, the objects to upsert and the names of the
+        # fields to update on conflict. Objects with a primary key are upserted, so
+        # there is no need to find out which of them already exist in the database
+        items_to_insert = [item for item in self.items_to_create if item.pk is None]
+        unknown_items = [item for item in self.items_to_create if item.pk is not None]
+        if unknown_items:
+            update_fields = self.all_update_fields
+        else:
+            update_fields = [
+                field_name
+                for field_name in self.all_update_fields
+                if field_name in self.update_fields
+            ]
+        return items_to_insert, self.items_to_update + unknown_items, update_fields
+
+    def _get_upsert_kwargs(self, update_fields):
+        return {
+            "update_conflicts": True,
+            "unique_fields": [self.model._meta.pk.name],
+            "update_fields": update_fields,
+        }
+
+    def apply(self, batch_size=None, upsert=False):
+        """
+        Write new and updated objects, with bulk_create() and bulk_update().
+
+        If upsert is true and the database supports it, objects that have a primary
+        key are instead written with bulk_create(update_conflicts=True), inserting
+        or updating each one as needed in a single query per batch.
+        """
+        base_manager = self.model._base_manager.using(self.using)
+
+        if upsert and self.can_upsert:
+            items_to_insert, items_to_upsert, update_fields = self._get_upserts()
+            if items_to_insert:
+                base_manager.bulk_create(items_to_insert, batch_size=batch_size)
+            if items_to_upsert:
+                base_manager.bulk_create(
+                    items_to_upsert,
+                    batch_size=batch_size,
+                    **self._get_upsert_kwargs(update_fields),
+                )
+            # upserted objects may have existed already, along with children of
+            # their own, so only the inserted ones are known to be new
+            self.created_items = items_to_insert
+            return
+
+        unknown_pks = self._get_unknown_pks()
+        existing_pks = set()
+        if unknown_pks:
+            existing_pks = set(
+                base_manager.filter(pk__in=unknown_pks).values_list("pk", flat=True)
+            )
+        items_to_create, items_to_update, update_fields = self._get_writes(existing_pks)
+
+        if items_to_create:
+            base_manager.bulk_create(items_to_create, batch_size=batch_size)
+        self.created_items = items_to_create
+
+        if items_to_update:
+            base_manager.bulk_update(
+                items_to_update, update_fields, batch_size=batch_size
+            )
+
+    async def aapply(self, batch_size=None, upsert=False):
+        """
+        Asynchronous version of apply()
+        """
+        base_manager = self.model._base_manager.using(self.using)
+
+        if upsert and self.can_upsert:
+            items_to_insert, items_to_upsert, update_fields = self._get_upserts()
+            if items_to_insert:
+                await base_manager.abulk_create(items_to_insert, batch_size=batch_size)
+            if items_to_upsert:
+                await base_manager.abulk_create(
+                    items_to_upsert,
+                    batch_size=batch_size,
+                    **self._get_upsert_kwargs(update_fields),
+                )
+            self.created_items = items_to_insert
+            return
+
+        unknown_pks = self._get_unknown_pks()
+        existing_pks = set()
+        if unknown_pks:
+            existing_pks = {
+                pk
+                async for pk in base_manager.filter(pk__in=unknown_pks).values_list(
+                    "pk", flat=True
+                )
+            }
+        items_to_create, items_to_update, update_fields = self._get_writes(existing_pks)
+
+        if items_to_create:
+            await base_manager.abulk_create(items_to_create, batch_size=batch_size)
+        self.created_items = items_to_create
+
+        if items_to_update:
+            await base_manager.abulk_update(
+                items_to_update, update_fields, batch_size=batch_size
+            )
 
 
 def create_deferring_foreign_related_manager(related, original_manager_cls):
@@ -39,8 +510,9 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
 
         @property
         def is_deferring(self):
-            return relation_name in getattr(
-                self.instance, "_cluster_related_objects", {}
+            return (
+                relation_name in getattr(self.instance, "_cluster_related_objects", {})
+                or self._get_overlay() is not None
             )
 
         def _get_cluster_related_objects(self):
@@ -53,6 +525,68 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
                 self.instance._cluster_related_objects = cluster_related_objects
                 return cluster_related_objects
 
+        def _get_overlay(self):
+            # Return the RelationOverlay of uncommitted changes to this relation, or
+            # None if there is none. A relation never has both an overlay and an
+            # in-memory object list
+            try:
+                return self.instance._cluster_related_overlays[relation_name]
+            except (AttributeError, KeyError):
+                return None
+
+        def _get_overlay_for_update(self):
+            # Return the RelationOverlay that add(), remove() and create() should
+            # record their changes in, creating it if the ParentalKey has
+            # overlay_changes set and the relation's objects have not been loaded from
+            # the database; or None if the changes should be made to the object list
+            overlay = self._get_overlay()
+            if (
+                overlay is None
+                and rel_field.overlay_changes
+                and self.instance.pk is not None
+                and relation_name not in self._get_cluster_related_objects()
+            ):
+                overlay = RelationOverlay()
+                try:
+                    self.instance._cluster_related_overlays[relation_name] = overlay
+                except AttributeError:
+                    self.instance._cluster_related_overlays = {relation_name: overlay}
+            return overlay
+
+        def _pop_overlay(self):
+            # Retrieve and discard the RelationOverlay for this relation, if any
+            try:
+                return self.instance._cluster_related_overlays.pop(relation_name, None)
+            except AttributeError:
+                return None
+
+        def _get_cluster_related_snapshots(self):
+            # Helper to retrieve the instance's _cluster_related_snapshots dict, which
+            # records the state of relations as they were loaded from the database,
+            # creating it if it does not already exist
+            try:
+                return self.instance._cluster_related_snapshots
+            except AttributeError:
+                cluster_related_snapshots = {}
+                self.instance._cluster_related_snapshots = cluster_related_snapshots
+                return cluster_related_snapshots
+
+        def _pop_loaded_pks_and_snapshots(self):
+            # Retrieve and discard the record made by get_object_list() of the objects
+            # it loaded, as a tuple of their primary keys and a dict of the field
+            # values of those that were fresh from the database, keyed by primary key.
+            # Returns None if there is no such record, or it was loaded for a
+            # different parent (e.g. if the parent's pk has been changed since)
+            try:
+                parent_pk, pks, snapshots = (
+                    self.instance._cluster_related_snapshots.pop(relation_name)
+                )
+            except (AttributeError, KeyError):
+                return None
+            if parent_pk != self.instance.pk:
+                return None
+            return pks, snapshots
+
         def get_live_query_set(self):
             # deprecated; renamed to get_live_queryset to match the move from
             # get_query_set to get_queryset in Django 1.6
@@ -75,10 +609,39 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
                 if self.instance.pk is None:
                     # use an empty fake queryset if the instance is unsaved
                     results = []
+                elif self._get_overlay() is not None:
+                    # reading the relation needs its full object list
+                    results = self._get_object_list()
                 else:
+                    self._prefetch_siblings()
                     return self.get_live_queryset()
 
-            return FakeQuerySet(related.related_model, results)
+            return self._get_fake_queryset(self._sort_pending(results))
+
+        def _get_fake_queryset(self, results):
+            return get_cached_fake_queryset(
+                self.instance, relation_name, rel_model, results
+            )
+
+        def iterator(self, chunk_size=None):
+            """
+            Iterate over the current object set. If it is not held in memory (either
+            as uncommitted changes or prefetched results), the objects are streamed
+            from the database in chunks of chunk_size, without being cached
+            """
+            queryset = self.get_queryset()
+            if queryset._result_cache is not None:
+                return iter(queryset)
+            return queryset.iterator(chunk_size=chunk_size)
+
+        def _prefetch_siblings(self):
+            # If the ParentalKey has auto_prefetch set, load this relation for the
+            # instance and all of its siblings from the same queryset with a single
+            # prefetch query, rather than one query per instance
+            if rel_field.auto_prefetch:
+                siblings = self.instance.__dict__.get("_cluster_siblings")
+                if siblings is not None:
+                    siblings.prefetch(self.instance, relation_name)
 
         def _apply_rel_filters(self, queryset):
             # Implemented as empty for compatibility sake
@@ -109,8 +672,9 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
             for rel_obj in qs:
                 instance = instances_dict[rel_obj_attr(rel_obj)]
                 setattr(rel_obj, rel_field.name, instance)
-            cache_name = rel_field.related_query_name()
-            return qs, rel_obj_attr, instance_attr, False, cache_name, False
+            # cache the results under the name that the original manager's
+            # get_queryset() and get_object_list() look for
+            return qs, rel_obj_attr, instance_attr, False, relation_name, False
 
         # Remove once we only support Django 5.0+
         if not DJANGO_VERSION >= (5, 0):
@@ -127,17 +691,90 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
             querysets from the live database instead), one is created, populating it
             with the live database state
             """
-            cluster_related_objects = self._get_cluster_related_objects()
+            return self._sort_pending(self._get_object_list())
 
+        def _get_object_list(self):
+            # As get_object_list(), but without applying any pending sort, for use by
+            # methods that modify the list
             try:
-                object_list = cluster_related_objects[relation_name]
+                return self._get_cluster_related_objects()[relation_name]
             except KeyError:
+                from_db = False
                 if self.instance.pk is None:
                     object_list = []
                 else:
-                    object_list = list(self.get_live_queryset())
-                cluster_related_objects[relation_name] = object_list
+                    if self._get_overlay() is None:
+                        self._prefetch_siblings()
+                    object_list = get_prefetched_objects(self.instance, relation_name)
+                    if object_list is None:
+                        queryset = self.get_live_queryset()
+                        # a queryset with cached results may hand out objects that
+                        # have been modified since they were fetched
+                        from_db = queryset._result_cache is None
+                        object_list = list(queryset)
+                return self._apply_overlay(
+                    self._set_loaded_object_list(object_list, from_db=from_db)
+                )
+
+        def _sort_pending(self, items):
+            return sort_pending_relation(self.instance, relation_name, items)
+
+        async def aget_object_list(self):
+            """
+            Asynchronous version of get_object_list()
+            """
+            try:
+                return self._sort_pending(
+                    self._get_cluster_related_objects()[relation_name]
+                )
+            except KeyError:
+                from_db = False
+                if self.instance.pk is None:
+                    object_list = []
+                else:
+                    object_list = get_prefetched_objects(self.instance, relation_name)
+                    if object_list is None:
+                        queryset = self.get_live_queryset()
+                        from_db = queryset._result_cache is None
+                        object_list = [item async for item in queryset]
+                return self._sort_pending(
+                    self._apply_overlay(
+                        self._set_loaded_object_list(object_list, from_db=from_db)
+                    )
+                )
 
+        def _set_loaded_object_list(self, object_list, from_db=False):
+            # Install object_list, as loaded from the database, as the in-memory state
+            # of this relation. from_db indicates that the objects have just been
+            # fetched by a query of our own; otherwise (e.g. if they were loaded by
+            # prefetch_related()) they may have been modified since
+            if self.instance.pk is not None:
+                # keep a record of the loaded objects, so that commit() knows the live
+                # object set without querying it again. Only objects fresh from the
+                # database have their field values recorded, so that commit() can
+                # write just the ones that have changed; the rest are saved in full
+                self._get_cluster_related_snapshots()[relation_name] = (
+                    self.instance.pk,
+                    {item.pk for item in object_list},
+                    {item.pk: get_field_values_snapshot(item) for item in object_list}
+                    if from_db
+                    else {},
+                )
+            self._get_cluster_related_objects()[relation_name] = object_list
+            pop_relation_unsorted(self.instance, relation_name)
+            return object_list
+
+        def _apply_overlay(self, object_list):
+            # Apply the changes recorded in this relation's RelationOverlay, if any, to
+            # the object list just loaded by _set_loaded_object_list(), which replaces
+            # the overlay as the in-memory state of the relation
+            overlay = self._pop_overlay()
+            if overlay is not None:
+                overlay.apply(object_list)
+                if overlay.added and rel_model._meta.ordering:
+                    mark_relation_unsorted(
+                        self.instance, relation_name, rel_model._meta.ordering
+                    )
             return object_list
 
         def add(self, *new_items):
@@ -145,44 +782,52 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
             Add the passed items to the stored object set, but do not commit them
             to the database
             """
-            items = self.get_object_list()
-
             for target in new_items:
-                item_matched = False
-                for i, item in enumerate(items):
-                    if item == target:
-                        # Replace the matched item with the new one. This ensures that any
-                        # modifications to that item's fields take effect within the recordset -
-                        # i.e. we can perform a virtual UPDATE to an object in the list
-                        # by calling add(updated_object). Which is semantically a bit dubious,
-                        # but it does the job...
-                        items[i] = target
-                        item_matched = True
-                        break
-                if not item_matched:
-                    items.append(target)
-
                 # update the foreign key on the added item to point back to the parent instance
                 setattr(target, related.field.name, self.instance)
 
-            # Sort list
-            if rel_model._meta.ordering and len(items) > 1:
-                sort_by_fields(items, rel_model._meta.ordering)
+            overlay = self._get_overlay_for_update()
+            if overlay is not None:
+                overlay.add(new_items)
+                bump_relation_generation(self.instance, relation_name)
+            else:
+                items = self._get_object_list()
+
+                # Any item in the list that matches a new one is replaced by it. This
+                # ensures that any modifications to that item's fields take effect
+                # within the recordset - i.e. we can perform a virtual UPDATE to an
+                # object in the list by calling add(updated_object). Which is
+                # semantically a bit dubious, but it does the job...
+                add_to_relation_object_list(
+                    self.instance, relation_name, items, new_items
+                )
+
+                # Sort list when it is next read
+                if rel_model._meta.ordering:
+                    mark_relation_unsorted(
+                        self.instance, relation_name, rel_model._meta.ordering
+                    )
 
         def remove(self, *items_to_remove):
             """
             Remove the passed items from the stored object set, but do not commit the change
             to the database
             """
-            items = self.get_object_list()
-
-            # filter items list in place: see http://stackoverflow.com/a/1208792/1853523
-            items[:] = [item for item in items if item not in items_to_remove]
+            overlay = self._get_overlay_for_update()
+            if overlay is not None:
+                overlay.remove(items_to_remove)
+            else:
+                remove_objects(self._get_object_list(), items_to_remove)
+            bump_relation_generation(self.instance, relation_name)
 
         def create(self, **kwargs):
-            items = self.get_object_list()
             new_item = related.related_model(**kwargs)
-            items.append(new_item)
+            overlay = self._get_overlay_for_update()
+            if overlay is not None:
+                overlay.add([new_item])
+            else:
+                self._get_object_list().append(new_item)
+            bump_relation_generation(self.instance, relation_name)
             return new_item
 
         def clear(self):
@@ -203,50 +848,403 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
                 # update the foreign key on the added item to point back to the parent instance
                 setattr(obj, related.field.name, self.instance)
 
-            # Clone and sort the 'objs' list, if necessary
+            # Sort the cloned 'objs' list when it is next read, if necessary
             if rel_model._meta.ordering and len(objs) > 1:
-                sort_by_fields(objs, rel_model._meta.ordering)
+                mark_relation_unsorted(
+                    self.instance, relation_name, rel_model._meta.ordering
+                )
 
             cluster_related_objects[relation_name] = objs
+            # the new object list replaces any changes recorded in an overlay
+            self._pop_overlay()
+            bump_relation_generation(self.instance, relation_name)
 
-        def commit(self):
+        def commit(self, *, bulk=False, batch_size=None, upsert=False):
             """
             Apply any changes made to the stored object set to the database.
             Any objects removed from the initial set will be deleted entirely
             from the database.
+
+            By default, each child object is written with its own save() call. If bulk
+            is true, the changes - along with any uncommitted relations on the child
+            objects themselves - are written with bulk queries instead, in batches of
+            batch_size objects if specified; see
+            modelcluster.models.bulk_commit_child_relations. As with Django's own bulk
+            methods, this bypasses the child model's save() method and the pre_save /
+            post_save signals. If upsert is true, the changes are written with bulk
+            queries in the same way, but objects that have a primary key are upserted
+            with bulk_create(update_conflicts=True) on databases that support it.
+
+            Objects that were loaded from the database by get_object_list() are only
+            written if their field values have changed since, and then only the changed
+            fields are updated - unless saving an object may set further fields itself
+            (see can_save_changed_fields_only), in which case every object is saved in
+            full. If the changes were recorded in a RelationOverlay (see
+            ParentalKey's overlay_changes option), only the objects added and removed
+            are written.
             """
             if self.instance.pk is None:
                 raise IntegrityError(
                     "Cannot commit relation %r on an unsaved model" % relation_name
                 )
 
-            try:
-                final_items = self.instance._cluster_related_objects[relation_name]
-            except (AttributeError, KeyError):
+            pending = self._get_pending_changes()
+            if pending is None:
                 # _cluster_related_objects entry never created => no changes to make
                 return
+            final_items, overlay = pending
+
+            if bulk or upsert:
+                from modelcluster.models import bulk_commit_child_relations
+
+                bulk_commit_child_relations(
+                    [self], batch_size=batch_size, upsert=upsert
+                )
+                return
 
             original_manager = original_manager_cls(self.instance)
 
-            live_items = list(original_manager.get_queryset())
-            for item in live_items:
-                if item not in final_items:
-                    item.delete()
+            if overlay is None:
+                live_pks, snapshots = self._get_live_pks_and_snapshots()
+                pks_to_delete, _, _ = diff_object_lists(live_pks, final_items)
+            else:
+                # the delete query below is restricted to the relation's objects, so
+                # removed primary keys that are not in the relation have no effect
+                pks_to_delete, snapshots = overlay.removed_pks, {}
+            if not can_save_changed_fields_only(rel_model):
+                # objects without a snapshot are saved in full
+                snapshots = {}
+
+            if pks_to_delete:
+                items_to_delete = original_manager.get_queryset().filter(
+                    pk__in=pks_to_delete
+                )
+                if rel_model.delete is Model.delete:
+                    # delete the objects, and anything that cascades from them, with
+                    # a single deletion collector rather than one per object
+                    items_to_delete.delete()
+                else:
+                    # respect the model's own delete() method
+                    for item in items_to_delete:
+                        item.delete()
 
             for item in final_items:
-                # Django 1.9+ bulk updates items by default which assumes
-                # that they have already been saved to the database.
-                # Disable this behaviour.
-                # https://code.djangoproject.com/ticket/18556
-                # https://github.com/django/django/commit/adc0c4fbac98f9cb975e8fa8220323b2de638b46
-                original_manager.add(item, bulk=False)
+                if item.pk is None or item.pk not in snapshots:
+                    # Django 1.9+ bulk updates items by default which assumes
+                    # that they have already been saved to the database.
+                    # Disable this behaviour.
+                    # https://code.djangoproject.com/ticket/18556
+                    # https://github.com/django/django/commit/adc0c4fbac98f9cb975e8fa8220323b2de638b46
+                    original_manager.add(item, bulk=False)
+                    continue
+
+                setattr(item, rel_field.name, self.instance)
+                update_fields = self._get_save_update_fields(item, snapshots[item.pk])
+                if update_fields:
+                    item.save(update_fields=update_fields)
+
+            self._end_commit()
+
+        async def acommit(self, *, bulk=False, batch_size=None, upsert=False):
+            """
+            Asynchronous version of commit()
+            """
+            if self.instance.pk is None:
+                raise IntegrityError(
+                    "Cannot commit relation %r on an unsaved model" % relation_name
+                )
 
-            # purge the _cluster_related_objects entry, so we switch back to live SQL
-            del self.instance._cluster_related_objects[relation_name]
+            pending = self._get_pending_changes()
+            if pending is None:
+                # _cluster_related_objects entry never created => no changes to make
+                return
+            final_items, overlay = pending
+
+            if bulk or upsert:
+                from modelcluster.models import abulk_commit_child_relations
+
+                await abulk_commit_child_relations(
+                    [self], batch_size=batch_size, upsert=upsert
+                )
+                return
+
+            original_manager = original_manager_cls(self.instance)
+
+            if overlay is None:
+                live_pks, snapshots = await self._aget_live_pks_and_snapshots()
+                pks_to_delete, _, _ = diff_object_lists(live_pks, final_items)
+            else:
+                pks_to_delete, snapshots = overlay.removed_pks, {}
+            if not can_save_changed_fields_only(rel_model):
+                snapshots = {}
+
+            if pks_to_delete:
+                items_to_delete = original_manager.get_queryset().filter(
+                    pk__in=pks_to_delete
+                )
+                if rel_model.delete is Model.delete:
+                    await items_to_delete.adelete()
+                else:
+                    async for item in items_to_delete:
+                        await item.adelete()
+
+            for item in final_items:
+                if item.pk is None or item.pk not in snapshots:
+                    # as in commit(), don't let add() assume the items are saved
+                    await original_manager.aadd(item, bulk=False)
+                    continue
+
+                setattr(item, rel_field.name, self.instance)
+                update_fields = self._get_save_update_fields(item, snapshots[item.pk])
+                if update_fields:
+                    await item.asave(update_fields=update_fields)
+
+            self._end_commit()
+
+        def _end_commit(self):
+            # purge the _cluster_related_objects entry or overlay, so we switch back
+            # to live SQL
+            self._get_cluster_related_objects().pop(relation_name, None)
+            self._pop_overlay()
+            discard_prefetched_objects(self.instance, relation_name)
+            pop_relation_unsorted(self.instance, relation_name)
+            bump_relation_generation(self.instance, relation_name)
+
+        def _get_pending_changes(self):
+            # Return a tuple of the objects that committing this relation needs to
+            # write, and the RelationOverlay they were recorded in - or None if the
+            # objects are the full in-memory object list. Returns None if there are no
+            # uncommitted changes
+            overlay = self._get_overlay()
+            if overlay is not None:
+                return list(overlay.added.values()), overlay
+            try:
+                final_items = self.instance._cluster_related_objects[relation_name]
+            except (AttributeError, KeyError):
+                return None
+            return self._sort_pending(final_items), None
+
+        def _get_overlay_lookup_pks(self, final_items, overlay):
+            # Return the primary keys that a bulk commit of the changes in a
+            # RelationOverlay needs to check the existence of within the relation
+            pks = set(overlay.removed_pks)
+            pks.update(item.pk for item in final_items if item.pk is not None)
+            return pks
+
+        def _get_live_pks_and_snapshots(self):
+            # Return the set of primary keys of the objects in this relation in the
+            # database, along with the field values recorded for them by
+            # get_object_list() (or an empty dict if these are not available)
+            loaded = self._pop_loaded_pks_and_snapshots()
+            if loaded is None:
+                live_pks = set(self.get_live_queryset().values_list("pk", flat=True))
+                return live_pks, {}
+            return loaded
+
+        async def _aget_live_pks_and_snapshots(self):
+            # Asynchronous version of _get_live_pks_and_snapshots()
+            loaded = self._pop_loaded_pks_and_snapshots()
+            if loaded is None:
+                live_pks = {
+                    pk
+                    async for pk in self.get_live_queryset().values_list(
+                        "pk", flat=True
+                    )
+                }
+                return live_pks, {}
+            return loaded
+
+        def _get_save_update_fields(self, item, snapshot):
+            # Return the update_fields to pass to save() for an object that was
+            # loaded from the database: its changed fields, plus any in-memory
+            # relations on the child object that also need committing
+            from modelcluster.models import ClusterableModel
+
+            update_fields = self._get_update_fields(item, snapshot)
+            if isinstance(item, ClusterableModel):
+                update_fields += list(get_pending_relations(item))
+            return update_fields
+
+        def _get_update_fields(self, item, snapshot):
+            # Return the names of the fields to be written for an object that was
+            # loaded from the database, given the field values it was loaded with
+            update_fields = get_changed_field_names(item, snapshot)
+            if update_fields:
+                # a full save() would update auto_now timestamps, so include them too
+                update_fields += [
+                    field.name
+                    for field in rel_model._meta.concrete_fields
+                    if getattr(field, "auto_now", False)
+                    and field.name not in update_fields
+                ]
+            return update_fields
+
+        def can_bulk_commit(self):
+            """
+            Return True if this relation can be committed with bulk queries.
+            bulk_create() cannot write multi-table inherited models, and we need the
+            primary keys of newly-created objects to be populated so that they behave
+            the same as after a save() (and can have their own child relations committed)
+            """
+            using = router.db_for_write(rel_model, instance=self.instance)
+            return (
+                not rel_model._meta.parents
+                and connections[using].features.can_return_rows_from_bulk_insert
+            )
+
+        def _get_bulk_commit_changes(self, is_new_parent=False):
+            # Return a RelationChanges record of the database writes needed to commit
+            # this relation, or None if there are no uncommitted changes. If
+            # is_new_parent is true, the parent has only just been inserted into the
+            # database, so there is no need to query for existing children
+            if self.instance.pk is None:
+                raise IntegrityError(
+                    "Cannot commit relation %r on an unsaved model" % relation_name
+                )
+
+            pending = self._get_pending_changes()
+            if pending is None:
+                return None
+            final_items, overlay = pending
+
+            if is_new_parent:
+                live_pks, snapshots = set(), {}
+            elif overlay is not None:
+                # only look up the objects that the overlay touches
+                lookup_pks = self._get_overlay_lookup_pks(final_items, overlay)
+                live_pks = set()
+                if lookup_pks:
+                    live_pks.update(
+                        self.get_live_queryset()
+                        .filter(pk__in=lookup_pks)
+                        .values_list("pk", flat=True)
+                    )
+                snapshots = {}
+            else:
+                live_pks, snapshots = self._get_live_pks_and_snapshots()
+            return self._build_bulk_commit_changes(final_items, live_pks, snapshots)
+
+        async def _aget_bulk_commit_changes(self, is_new_parent=False):
+            # Asynchronous version of _get_bulk_commit_changes()
+            if self.instance.pk is None:
+                raise IntegrityError(
+                    "Cannot commit relation %r on an unsaved model" % relation_name
+                )
+
+            pending = self._get_pending_changes()
+            if pending is None:
+                return None
+            final_items, overlay = pending
+
+            if is_new_parent:
+                live_pks, snapshots = set(), {}
+            elif overlay is not None:
+                lookup_pks = self._get_overlay_lookup_pks(final_items, overlay)
+                live_pks = set()
+                if lookup_pks:
+                    live_pks.update(
+                        [
+                            pk
+                            async for pk in self.get_live_queryset()
+                            .filter(pk__in=lookup_pks)
+                            .values_list("pk", flat=True)
+                        ]
+                    )
+                snapshots = {}
+            else:
+                live_pks, snapshots = await self._aget_live_pks_and_snapshots()
+            return self._build_bulk_commit_changes(final_items, live_pks, snapshots)
+
+        def _build_bulk_commit_changes(self, final_items, live_pks, snapshots):
+            # Build the RelationChanges record for _get_bulk_commit_changes(), given
+            # the live primary keys and loaded field values of the relation
+            for item in final_items:
+                # update the foreign key on the item to point back to the parent instance
+                setattr(item, rel_field.name, self.instance)
+
+            pks_to_delete, items_to_create, items_to_update = diff_object_lists(
+                live_pks, final_items
+            )
+
+            changes = RelationChanges(
+                rel_model, router.db_for_write(rel_model, instance=self.instance)
+            )
+            changes.items = list(final_items)
+            changes.pks_to_delete = pks_to_delete
+            changes.items_to_create = items_to_create
+            for item in items_to_update:
+                if item.pk in snapshots:
+                    update_fields = self._get_update_fields(item, snapshots[item.pk])
+                    if not update_fields:
+                        continue
+                    changes.update_fields.update(update_fields)
+                else:
+                    changes.update_fields.update(changes.all_update_fields)
+                changes.items_to_update.append(item)
+
+            return changes
 
     return DeferringRelatedManager
 
 
+def get_cached_fake_queryset(instance, relation_name, model, results):
+    """
+    Return a FakeQuerySet of the given results list (the in-memory object list for
+    the named relation of the given instance, of the given model). On
+    ClusterableModel instances, the FakeQuerySet is reused while the object list is
+    the same list; FakeQuerySet does not copy the list, so it reflects changes made
+    to it in place by add() and remove(), and runs any sort that add() has deferred
+    before reading it.
+    """
+    from modelcluster.models import ClusterableModel
+
+    cacheable = isinstance(instance, ClusterableModel)
+    if cacheable:
+        # FakeQuerySets are kept in the instance's __dict__, along with a weak
+        # reference to the instance to check that the entry does belong to it in case
+        # the dict has been copied; ClusterableModel.__getstate__ leaves them out
+        try:
+            querysets = instance.__dict__["_cluster_fake_querysets"]
+        except KeyError:
+            querysets = instance.__dict__["_cluster_fake_querysets"] = {}
+        try:
+            instance_ref, queryset = querysets[relation_name]
+        except KeyError:
+            pass
+        else:
+            if instance_ref() is instance and queryset._results is results:
+                return queryset
+
+    # the list's indexes are rebuilt whenever the relation is modified. They and the
+    # deferred sort refer to the instance by weak reference, so that caching the
+    # queryset on the instance does not create a reference cycle
+    instance_ref = weakref.ref(instance)
+
+    def prepare_results(results):
+        instance = instance_ref()
+        # the list may have been replaced on the instance since the queryset was made
+        if (
+            instance is not None
+            and getattr(instance, "_cluster_related_objects", {}).get(relation_name)
+            is results
+        ):
+            sort_pending_relation(instance, relation_name, results)
+
+    index_field_names = get_index_field_names(model)
+    indexes = None
+    if index_field_names:
+        indexes = FakeQuerySetIndexes(
+            index_field_names,
+            lambda: get_relation_index_version(instance_ref(), relation_name),
+        )
+    queryset = FakeQuerySet(
+        model, results, indexes=indexes, prepare_results=prepare_results
+    )
+    if cacheable:
+        querysets[relation_name] = (instance_ref, queryset)
+    return queryset
+
+
 class ChildObjectsDescriptor(ReverseManyToOneDescriptor):
     def __get__(self, instance, instance_type=None):
         if instance is None:
@@ -266,12 +1264,37 @@ class ChildObjectsDescriptor(ReverseManyToOneDescriptor):
 
 
 class ParentalKey(ForeignKey):
+    """
+    A ForeignKey from a child model to a ClusterableModel, whose reverse relation
+    is managed in memory until the parent is saved.
+
+    If overlay_changes is true, objects added to or removed from the relation of a
+    saved parent are recorded as a RelationOverlay of pending changes, rather than
+    first loading all of the relation's existing objects from the database; saving
+    the parent then writes only those changes. The existing objects are loaded (and
+    the changes applied to them) if the relation is read before it is committed.
+
+    If auto_prefetch is true, the first read of the relation on a parent that was
+    loaded by a ClusterableQuerySet (see ClusterableManager) loads the relation for
+    all of the parents from that queryset with a single prefetch query.
+    """
+
     related_accessor_class = ChildObjectsDescriptor
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, overlay_changes=False, auto_prefetch=False, **kwargs):
         kwargs.setdefault("on_delete", CASCADE)
+        self.overlay_changes = overlay_changes
+        self.auto_prefetch = auto_prefetch
         super().__init__(*args, **kwargs)
 
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.overlay_changes:
+            kwargs["overlay_changes"] = True
+        if self.auto_prefetch:
+            kwargs["auto_prefetch"] = True
+        return name, path, args, kwargs
+
     def check(self, **kwargs):
         from modelcluster.models import ClusterableModel
 
@@ -316,6 +1339,7 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
     relation_name = rel_field.name
     query_field_name = rel_field.related_query_name()
     source_field_name = rel_field.m2m_field_name()
+    target_field_name = rel_field.m2m_reverse_field_name()
     rel_model = rel.model
     superclass = rel_model._default_manager.__class__
     rel_through = rel.through
@@ -330,6 +1354,31 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
         def get_original_manager(self):
             return original_manager_cls(self.instance)
 
+        def _get_cluster_related_snapshots(self):
+            # Helper to retrieve the instance's _cluster_related_snapshots dict, which
+            # records the state of relations as they were loaded from the database,
+            # creating it if it does not already exist
+            try:
+                return self.instance._cluster_related_snapshots
+            except AttributeError:
+                cluster_related_snapshots = {}
+                self.instance._cluster_related_snapshots = cluster_related_snapshots
+                return cluster_related_snapshots
+
+        def _pop_loaded_pks(self):
+            # Retrieve and discard the set of primary keys recorded by get_object_list().
+            # Returns None if there is no such record, or it was loaded for a different
+            # parent (e.g. if the parent's pk has been changed since)
+            try:
+                parent_pk, pks = self.instance._cluster_related_snapshots.pop(
+                    relation_name
+                )
+            except (AttributeError, KeyError):
+                return None
+            if parent_pk != self.instance.pk:
+                return None
+            return pks
+
         def get_live_queryset(self):
             """
             return the original manager's queryset, which reflects the live database
@@ -361,7 +1410,23 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
                     # so bypass it and return an empty queryset
                     return rel_model.objects.none()
 
-            return FakeQuerySet(rel_model, results)
+            return self._get_fake_queryset(self._sort_pending(results))
+
+        def _get_fake_queryset(self, results):
+            return get_cached_fake_queryset(
+                self.instance, relation_name, rel_model, results
+            )
+
+        def iterator(self, chunk_size=None):
+            """
+            Iterate over the current object set. If it is not held in memory (either
+            as uncommitted changes or prefetched results), the objects are streamed
+            from the database in chunks of chunk_size, without being cached
+            """
+            queryset = self.get_queryset()
+            if queryset._result_cache is not None:
+                return iter(queryset)
+            return queryset.iterator(chunk_size=chunk_size)
 
         def get_prefetch_querysets(self, instances, querysets=None):
             # Derived from Django's ManyRelatedManager.get_prefetch_queryset.
@@ -429,14 +1494,48 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
             querysets from the live database instead), one is created, populating it
             with the live database state
             """
-            cluster_related_objects = self._get_cluster_related_objects()
+            return self._sort_pending(self._get_object_list())
 
+        def _get_object_list(self):
+            # As get_object_list(), but without applying any pending sort, for use by
+            # methods that modify the list
             try:
-                object_list = cluster_related_objects[relation_name]
+                return self._get_cluster_related_objects()[relation_name]
             except KeyError:
-                object_list = list(self.get_live_queryset())
-                cluster_related_objects[relation_name] = object_list
+                object_list = get_prefetched_objects(self.instance, relation_name)
+                if object_list is None:
+                    object_list = list(self.get_live_queryset())
+                return self._set_loaded_object_list(object_list)
+
+        def _sort_pending(self, items):
+            return sort_pending_relation(self.instance, relation_name, items)
 
+        async def aget_object_list(self):
+            """
+            Asynchronous version of get_object_list()
+            """
+            try:
+                return self._sort_pending(
+                    self._get_cluster_related_objects()[relation_name]
+                )
+            except KeyError:
+                object_list = get_prefetched_objects(self.instance, relation_name)
+                if object_list is None:
+                    object_list = [item async for item in self.get_live_queryset()]
+                return self._set_loaded_object_list(object_list)
+
+        def _set_loaded_object_list(self, object_list):
+            # Install object_list, as loaded from the database, as the in-memory state
+            # of this relation
+            if self.instance.pk:
+                # keep a record of the loaded primary keys, so that commit()
+                # knows the live object set without querying it again
+                self._get_cluster_related_snapshots()[relation_name] = (
+                    self.instance.pk,
+                    {item.pk for item in object_list},
+                )
+            self._get_cluster_related_objects()[relation_name] = object_list
+            pop_relation_unsorted(self.instance, relation_name)
             return object_list
 
         def add(self, *new_items):
@@ -444,7 +1543,7 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
             Add the passed items to the stored object set, but do not commit them
             to the database
             """
-            items = self.get_object_list()
+            items = self._get_object_list()
 
             for target in new_items:
                 if target.pk is None:
@@ -452,23 +1551,19 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
                         '"%r" needs to have a primary key value before '
                         "it can be added to a parental many-to-many relation." % target
                     )
-                item_matched = False
-                for i, item in enumerate(items):
-                    if item == target:
-                        # Replace the matched item with the new one. This ensures that any
-                        # modifications to that item's fields take effect within the recordset -
-                        # i.e. we can perform a virtual UPDATE to an object in the list
-                        # by calling add(updated_object). Which is semantically a bit dubious,
-                        # but it does the job...
-                        items[i] = target
-                        item_matched = True
-                        break
-                if not item_matched:
-                    items.append(target)
-
-            # Sort list
-            if rel_model._meta.ordering and len(items) > 1:
-                sort_by_fields(items, rel_model._meta.ordering)
+
+            # Any item in the list that matches a new one is replaced by it. This ensures
+            # that any modifications to that item's fields take effect within the
+            # recordset - i.e. we can perform a virtual UPDATE to an object in the list
+            # by calling add(updated_object). Which is semantically a bit dubious,
+            # but it does the job...
+            add_to_relation_object_list(self.instance, relation_name, items, new_items)
+
+            # Sort list when it is next read
+            if rel_model._meta.ordering:
+                mark_relation_unsorted(
+                    self.instance, relation_name, rel_model._meta.ordering
+                )
 
         def clear(self):
             """
@@ -489,15 +1584,21 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
                 # fixture), and allow the orignal manager to handle things
                 original_manager = self.get_original_manager()
                 original_manager.set(objs)
+                # the database state no longer matches any previously loaded one
+                self._pop_loaded_pks()
+                bump_relation_generation(self.instance, relation_name)
                 return
 
             cluster_related_objects = self._get_cluster_related_objects()
 
-            # Clone and sort the 'objs' list, if necessary
+            # Sort the cloned 'objs' list when it is next read, if necessary
             if rel_model._meta.ordering and len(objs) > 1:
-                sort_by_fields(objs, rel_model._meta.ordering)
+                mark_relation_unsorted(
+                    self.instance, relation_name, rel_model._meta.ordering
+                )
 
             cluster_related_objects[relation_name] = objs
+            bump_relation_generation(self.instance, relation_name)
 
         def set(self, objs, *, clear=False, through_defaults=None):
             self.set_base(objs, clear=clear, through_defaults=through_defaults)
@@ -507,10 +1608,10 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
             Remove the passed items from the stored object set, but do not commit the change
             to the database
             """
-            items = self.get_object_list()
+            items = self._get_object_list()
 
-            # filter items list in place: see http://stackoverflow.com/a/1208792/1853523
-            items[:] = [item for item in items if item not in items_to_remove]
+            remove_objects(items, items_to_remove)
+            bump_relation_generation(self.instance, relation_name)
 
         def commit(self):
             """
@@ -526,20 +1627,80 @@ def create_deferring_forward_many_to_many_manager(rel, original_manager_cls):
             except (AttributeError, KeyError):
                 # _cluster_related_objects entry never created => no changes to make
                 return
+            self._sort_pending(final_items)
 
             original_manager = self.get_original_manager()
-            live_items = list(original_manager.get_queryset())
 
-            items_to_remove = [item for item in live_items if item not in final_items]
-            items_to_add = [item for item in final_items if item not in live_items]
+            live_pks = self._pop_loaded_pks()
+            if live_pks is None:
+                live_pks = self._get_live_pks()
 
-            if items_to_remove:
-                original_manager.remove(*items_to_remove)
+            pks_to_remove, items_to_add, _ = diff_object_lists(live_pks, final_items)
+
+            # The original manager's remove() and add() each write the through table
+            # with a single query (using bulk_create with ignore_conflicts for add(),
+            # where the backend supports it), and send the m2m_changed signals
+            if pks_to_remove:
+                original_manager.remove(*pks_to_remove)
             if items_to_add:
                 original_manager.add(*items_to_add)
 
+            self._end_commit()
+
+        async def acommit(self):
+            """
+            Asynchronous version of commit()
+            """
+            if not self.instance.pk:
+                raise IntegrityError(
+                    "Cannot commit relation %r on an unsaved model" % relation_name
+                )
+
+            try:
+                final_items = self.instance._cluster_related_objects[relation_name]
+            except (AttributeError, KeyError):
+                # _cluster_related_objects entry never created => no changes to make
+                return
+            self._sort_pending(final_items)
+
+            original_manager = self.get_original_manager()
+
+            live_pks = self._pop_loaded_pks()
+            if live_pks is None:
+                live_pks = {pk async for pk in self._get_live_pks_queryset()}
+
+            pks_to_remove, items_to_add, _ = diff_object_lists(live_pks, final_items)
+
+            if pks_to_remove:
+                await original_manager.aremove(*pks_to_remove)
+            if items_to_add:
+                await original_manager.aadd(*items_to_add)
+
+            self._end_commit()
+
+        def _end_commit(self):
             # purge the _cluster_related_objects entry, so we switch back to live SQL
             del self.instance._cluster_related_objects[relation_name]
+            discard_prefetched_objects(self.instance, relation_name)
+            pop_relation_unsorted(self.instance, relation_name)
+            bump_relation_generation(self.instance, relation_name)
+
+        def _get_live_pks(self):
+            # Return the set of primary keys of the objects related to this instance
+            # in the database
+            return set(self._get_live_pks_queryset())
+
+        def _get_live_pks_queryset(self):
+            # Return a queryset of the primary keys of the objects related to this
+            # instance, read directly from the through table, without joining to the
+            # related model's table or instantiating its objects
+            db = router.db_for_write(rel_through, instance=self.instance)
+            target_field = rel_through._meta.get_field(target_field_name)
+            return (
+                rel_through._default_manager.using(db)
+                .filter(**{source_field_name: self.instance})
+                .values_list(target_field.attname, flat=True)
+            )
 
     return DeferringManyRelatedManager
 
@@ -15,7 +15,8 @@ from django.db.models.fields.related import ForeignObjectRel
 from django.utils.html import format_html_join
 
 from modelcluster.fields import ParentalManyToManyField
-from modelcluster.models import get_all_child_relations
+from modelcluster.models import get_child_relation_info
+from modelcluster.utils import get_gapped_sort_order_values
 
 
 class BaseTransientModelFormSet(BaseModelFormSet):
@@ -108,10 +109,27 @@ class BaseChildFormSet(BaseTransientModelFormSet):
 
         # if model has a sort_order_field defined, assign order indexes to the attribute
         # named in it
+        reordered_instances = []
         if self.can_order and hasattr(self.model, "sort_order_field"):
             sort_order_field = getattr(self.model, "sort_order_field")
-            for i, form in enumerate(self.ordered_forms):
-                setattr(form.instance, sort_order_field, i)
+            sort_order_gap = getattr(self.model, "sort_order_gap", None)
+            if sort_order_gap:
+                # only renumber the objects that need it to achieve the new order;
+                # these must be committed even if their form is unchanged
+                instances = [form.instance for form in self.ordered_forms]
+                saved_instance_ids = {id(obj) for obj in saved_instances}
+                sort_order_values = get_gapped_sort_order_values(
+                    [getattr(obj, sort_order_field) for obj in instances],
+                    sort_order_gap,
+                )
+                for obj, value in zip(instances, sort_order_values):
+                    if getattr(obj, sort_order_field) != value:
+                        setattr(obj, sort_order_field, value)
+                        if id(obj) not in saved_instance_ids:
+                            reordered_instances.append(obj)
+            else:
+                for i, form in enumerate(self.ordered_forms):
+                    setattr(form.instance, sort_order_field, i)
 
         # If the manager has existing instances with a blank ID, we have no way of knowing
         # whether these correspond to items in the submitted data. We'll assume that they do,
@@ -122,7 +140,7 @@ class BaseChildFormSet(BaseTransientModelFormSet):
         if no_id_instances:
             manager.remove(*no_id_instances)
 
-        manager.add(*saved_instances)
+        manager.add(*saved_instances, *reordered_instances)
         manager.remove(*self.deleted_objects)
 
         self.save_m2m()  # ensures any parental-m2m fields are saved.
@@ -306,7 +324,7 @@ class ClusterFormMetaclass(ModelFormMetaclass):
         if opts.model:
             formsets = {}
 
-            for rel in get_all_child_relations(opts.model):
+            for rel in get_child_relation_info(opts.model).relations:
                 # to build a childformset class from this relation, we need to specify:
                 # - the base model (opts.model)
                 # - the child model (rel.field.model)
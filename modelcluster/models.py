@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 import json
 import datetime
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import FieldDoesNotExist
 from django.db import models, transaction
 from django.db.models.fields.related import ForeignObjectRel
@@ -11,7 +12,13 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
 from django.utils import timezone
 
-from modelcluster.fields import ParentalKey, ParentalManyToManyField
+from modelcluster.fields import (
+    ClusterSiblings,
+    ParentalKey,
+    ParentalManyToManyField,
+    get_pending_relations,
+)
+from modelcluster.utils import delete_querysets
 
 
 def get_field_value(field, model):
@@ -141,16 +148,55 @@ def model_from_serializable_data(model, data, check_fks=True, strict_fks=False):
     return obj
 
 
+class ChildRelationInfo:
+    """
+    The child relations and ParentalManyToManyFields of a model, including ones
+    attached to ancestors of the model, as found in the given list of its fields
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.relations = tuple(
+            field for field in fields if isinstance(field.remote_field, ParentalKey)
+        )
+        self.relation_names = tuple(rel.get_accessor_name() for rel in self.relations)
+        self.m2m_fields = tuple(
+            field for field in fields if isinstance(field, ParentalManyToManyField)
+        )
+        self.m2m_field_names = tuple(field.name for field in self.m2m_fields)
+
+        self.auto_prefetch_relation_names = tuple(
+            name
+            for rel, name in zip(self.relations, self.relation_names)
+            if rel.remote_field.auto_prefetch
+        )
+
+        self.relation_name_set = frozenset(self.relation_names)
+        self.m2m_field_name_set = frozenset(self.m2m_field_names)
+        self.all_names = self.relation_name_set | self.m2m_field_name_set
+
+
+def get_child_relation_info(model):
+    """
+    Return the ChildRelationInfo for the given model (or model instance). This is
+    computed on first use and kept on the model's _meta; it is recomputed if Django
+    rebuilds the model's field list (e.g. because another model has been registered).
+    """
+    opts = model._meta
+    fields = opts.get_fields()
+    info = getattr(opts, "_child_relation_info", None)
+    if info is None or info.fields is not fields:
+        info = ChildRelationInfo(fields)
+        opts._child_relation_info = info
+    return info
+
+
 def get_all_child_relations(model):
     """
     Return a list of RelatedObject records for child relations of the given model,
     including ones attached to ancestors of the model
     """
-    return [
-        field
-        for field in model._meta.get_fields()
-        if isinstance(field.remote_field, ParentalKey)
-    ]
+    return list(get_child_relation_info(model).relations)
 
 
 def get_all_child_m2m_relations(model):
@@ -158,11 +204,239 @@ def get_all_child_m2m_relations(model):
     Return a list of ParentalManyToManyFields on the given model,
     including ones attached to ancestors of the model
     """
-    return [
-        field
-        for field in model._meta.get_fields()
-        if isinstance(field, ParentalManyToManyField)
-    ]
+    return list(get_child_relation_info(model).m2m_fields)
+
+
+def get_cluster_prefetch_lookups(model, depth=None, relations=None):
+    """
+    Return a list of prefetch_related() lookups for the child relations and
+    ParentalManyToManyFields of the given ClusterableModel, and (recursively) those
+    of its ClusterableModel children. If depth is given, only that many levels of
+    relations are included. If relations is given, only the named relations of the
+    model itself are followed, although all relations below them are included.
+    """
+    if relations is not None:
+        unknown_relations = set(relations) - get_child_relation_info(model).all_names
+        if unknown_relations:
+            raise LookupError(
+                "%s has no child relation or ParentalManyToManyField named %s"
+                % (model.__name__, ", ".join(sorted(unknown_relations)))
+            )
+
+    lookups = []
+    _add_cluster_prefetch_lookups(lookups, model, "", depth, relations, {model})
+    return lookups
+
+
+def _add_cluster_prefetch_lookups(lookups, model, prefix, depth, relations, ancestors):
+    # Add the lookups for one level of get_cluster_prefetch_lookups() to the list,
+    # stopping at models that already appear on the path from the root, so that
+    # recursive relations do not recurse forever
+    if depth is not None and depth < 1:
+        return
+
+    child_relation_info = get_child_relation_info(model)
+    for rel, name in zip(
+        child_relation_info.relations, child_relation_info.relation_names
+    ):
+        if relations is not None and name not in relations:
+            continue
+
+        lookup = prefix + name
+        lookups.append(lookup)
+
+        child_model = rel.related_model
+        if issubclass(child_model, ClusterableModel) and child_model not in ancestors:
+            _add_cluster_prefetch_lookups(
+                lookups,
+                child_model,
+                lookup + "__",
+                None if depth is None else depth - 1,
+                None,
+                ancestors | {child_model},
+            )
+
+    for name in child_relation_info.m2m_field_names:
+        if relations is None or name in relations:
+            lookups.append(prefix + name)
+
+
+class ClusterableQuerySet(models.QuerySet):
+    def _fetch_all(self):
+        is_fetched = self._result_cache is not None
+        super()._fetch_all()
+        if not is_fetched:
+            self._set_cluster_siblings()
+
+    def _set_cluster_siblings(self):
+        # Give each of the fetched instances a record of the others, so that relations
+        # with ParentalKey.auto_prefetch set can be loaded for all of them at once
+        results = self._result_cache
+        if (
+            len(results) < 2
+            or not issubclass(self._iterable_class, models.query.ModelIterable)
+            or not get_child_relation_info(self.model).auto_prefetch_relation_names
+        ):
+            return
+
+        siblings = ClusterSiblings(results)
+        for obj in results:
+            obj.__dict__["_cluster_siblings"] = siblings
+
+    def prefetch_cluster(self, depth=None, relations=None):
+        """
+        Prefetch the child relations and ParentalManyToManyFields of the results,
+        along with the relations of their ClusterableModel children all the way down
+        (or to `depth` levels), with one query per relation at each level. If
+        relations is given, only the named relations of the results are followed.
+        See get_cluster_prefetch_lookups.
+        """
+        return self.prefetch_related(
+            *get_cluster_prefetch_lookups(self.model, depth=depth, relations=relations)
+        )
+
+
+class ClusterableManager(models.Manager.from_queryset(ClusterableQuerySet)):
+    """
+    A manager providing ClusterableQuerySet methods such as prefetch_cluster(), for
+    use as `objects = ClusterableManager()` on ClusterableModel subclasses
+    """
+
+    pass
+
+
+def bulk_commit_child_relations(managers, batch_size=None, upsert=False):
+    """
+    Commit the given child relation managers (as obtained from the ParentalKey
+    relations of saved ClusterableModel instances) to the database with bulk queries,
+    along with any uncommitted relations on their child objects, working down the
+    whole tree of in-memory objects.
+
+    Each level of the tree is written as a unit: deletions, insertions and updates
+    are grouped by model across all relations at that level, so that (for example)
+    the songs of every album of a band are inserted with a single bulk_create(). The
+    primary keys of newly-inserted objects are then available to the ParentalKeys of
+    the level below.
+
+    If upsert is true, objects with a primary key are written with
+    bulk_create(update_conflicts=True) where the database supports it, rather than
+    being checked for existence and then updated; see RelationChanges.apply.
+
+    Relations that cannot be committed in bulk (see
+    DeferringRelatedManager.can_bulk_commit) are committed one object at a time.
+    """
+    # ids of the objects inserted at the previous level
+    new_parent_ids = set()
+
+    while managers:
+        level_changes = {}
+        for manager in managers:
+            if not manager.can_bulk_commit():
+                manager.commit()
+                continue
+
+            _merge_relation_changes(
+                level_changes,
+                manager._get_bulk_commit_changes(
+                    is_new_parent=id(manager.instance) in new_parent_ids
+                ),
+            )
+
+        # Perform all deletions first, so that re-added objects do not conflict
+        # with the ones they replace on unique constraints
+        delete_querysets(_get_delete_querysets(level_changes))
+
+        for changes in level_changes.values():
+            changes.apply(batch_size=batch_size, upsert=upsert)
+
+        for manager in managers:
+            if manager.is_deferring:
+                manager._end_commit()
+
+        # Move on to any uncommitted relations of the objects just written
+        managers, m2m_managers, new_parent_ids = _get_next_commit_level(level_changes)
+        for manager in m2m_managers:
+            manager.commit()
+
+
+async def abulk_commit_child_relations(managers, batch_size=None, upsert=False):
+    """
+    Asynchronous version of bulk_commit_child_relations
+    """
+    new_parent_ids = set()
+
+    while managers:
+        level_changes = {}
+        for manager in managers:
+            if not manager.can_bulk_commit():
+                await manager.acommit()
+                continue
+
+            _merge_relation_changes(
+                level_changes,
+                await manager._aget_bulk_commit_changes(
+                    is_new_parent=id(manager.instance) in new_parent_ids
+                ),
+            )
+
+        await sync_to_async(delete_querysets)(_get_delete_querysets(level_changes))
+
+        for changes in level_changes.values():
+            await changes.aapply(batch_size=batch_size, upsert=upsert)
+
+        for manager in managers:
+            if manager.is_deferring:
+                manager._end_commit()
+
+        managers, m2m_managers, new_parent_ids = _get_next_commit_level(level_changes)
+        for manager in m2m_managers:
+            await manager.acommit()
+
+
+def _merge_relation_changes(level_changes, changes):
+    # Add a RelationChanges record to the ones for the current level of a bulk
+    # commit, which are keyed by model and database
+    if changes is None:
+        return
+
+    key = (changes.model, changes.using)
+    if key in level_changes:
+        level_changes[key].merge(changes)
+    else:
+        level_changes[key] = changes
+
+
+def _get_delete_querysets(level_changes):
+    # Return querysets of the objects removed at one level of a bulk commit
+    querysets = [changes.get_delete_queryset() for changes in level_changes.values()]
+    return [queryset for queryset in querysets if queryset is not None]
+
+
+def _get_next_commit_level(level_changes):
+    # Return the managers for the uncommitted relations of the objects written at
+    # one level of a bulk commit, as a list of child relation managers for the next
+    # level and a list of ParentalManyToManyField managers (which only need the
+    # objects themselves to be saved), along with the ids of the objects inserted
+    managers = []
+    m2m_managers = []
+    new_parent_ids = set()
+    for changes in level_changes.values():
+        new_parent_ids.update(id(item) for item in changes.created_items)
+        for item in changes.items:
+            if not isinstance(item, ClusterableModel):
+                continue
+            pending_relations = get_pending_relations(item)
+            if not pending_relations:
+                continue
+
+            child_relation_names = get_child_relation_info(item).relation_name_set
+            for name in pending_relations:
+                if name in child_relation_names:
+                    managers.append(getattr(item, name))
+                else:
+                    m2m_managers.append(getattr(item, name))
+
+    return managers, m2m_managers, new_parent_ids
 
 
 class ClusterableModel(models.Model):
@@ -171,11 +445,9 @@ class ClusterableModel(models.Model):
         Extend the standard model constructor to allow child object lists to be passed in
         via kwargs
         """
-        child_relation_names = [
-            rel.get_accessor_name() for rel in get_all_child_relations(self)
-        ] + [field.name for field in get_all_child_m2m_relations(self)]
+        child_relation_names = get_child_relation_info(self).all_names
 
-        if any(name in kwargs for name in child_relation_names):
+        if kwargs and not child_relation_names.isdisjoint(kwargs):
             # One or more child relation values is being passed in the constructor; need to
             # separate these from the standard field kwargs to be passed to 'super'
             kwargs_for_super = kwargs.copy()
@@ -190,48 +462,166 @@ class ClusterableModel(models.Model):
         else:
             super().__init__(*args, **kwargs)
 
-    def save(self, **kwargs):
+    def relation_generation(self, name):
+        """
+        Return a number that changes whenever the in-memory contents of the named
+        child relation or ParentalManyToManyField are modified through its manager
+        (with add(), remove(), set() and so on), or the relation is committed. This is
+        0 if neither has happened. Changes to the fields of the related objects are
+        not tracked.
+        """
+        return getattr(self, "_cluster_related_generations", {}).get(name, 0)
+
+    def cluster_generation(self):
+        """
+        Return a number that changes whenever any relation of this object, or of the
+        ClusterableModel objects in its in-memory child relations (recursively), is
+        modified or committed, as for relation_generation. Generation numbers are
+        unique and increasing across all relations, so this is the highest of them.
+        """
+        generation = max(
+            getattr(self, "_cluster_related_generations", {}).values(), default=0
+        )
+        child_relation_names = get_child_relation_info(self).relation_name_set
+        for name, items in get_pending_relations(self).items():
+            if name not in child_relation_names:
+                continue
+            for item in items:
+                if isinstance(item, ClusterableModel):
+                    generation = max(generation, item.cluster_generation())
+        return generation
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # FakeQuerySets cached for the in-memory relations refer back to this
+        # instance, so must not be copied; nor can the ClusterSiblings record of the
+        # instances loaded alongside it
+        state.pop("_cluster_fake_querysets", None)
+        state.pop("_cluster_siblings", None)
+        return state
+
+    def save(
+        self,
+        *,
+        bulk=False,
+        batch_size=None,
+        upsert=False,
+        commit_relations=True,
+        **kwargs,
+    ):
         """
         Save the model and commit all child relations.
+
+        If bulk is true, child relations - and the relations of any ClusterableModel
+        children, all the way down - are committed with bulk queries rather than one
+        save() call per child object; see bulk_commit_child_relations. upsert=True
+        does the same, but upserts the child objects that have a primary key.
+
+        If commit_relations is false, only the model's own fields are saved, and
+        child relations are left uncommitted.
         """
-        child_relation_names = [
-            rel.get_accessor_name() for rel in get_all_child_relations(self)
-        ]
-        child_m2m_field_names = [
-            field.name for field in get_all_child_m2m_relations(self)
-        ]
-
-        update_fields = kwargs.pop("update_fields", None)
-        if update_fields is None:
-            real_update_fields = None
-            relations_to_commit = child_relation_names
-            m2m_fields_to_commit = child_m2m_field_names
-        else:
-            real_update_fields = []
-            relations_to_commit = []
-            m2m_fields_to_commit = []
-            for field in update_fields:
-                if field in child_relation_names:
-                    relations_to_commit.append(field)
-                elif field in child_m2m_field_names:
-                    m2m_fields_to_commit.append(field)
-                else:
-                    real_update_fields.append(field)
+        real_update_fields, relations_to_commit, m2m_fields_to_commit = (
+            self._get_fields_to_commit(kwargs.pop("update_fields", None))
+        )
 
         super().save(update_fields=real_update_fields, **kwargs)
 
-        for relation in relations_to_commit:
-            getattr(self, relation).commit()
+        if not commit_relations:
+            return
+
+        if bulk or upsert:
+            bulk_commit_child_relations(
+                [getattr(self, relation) for relation in relations_to_commit],
+                batch_size=batch_size,
+                upsert=upsert,
+            )
+        else:
+            for relation in relations_to_commit:
+                getattr(self, relation).commit()
 
         for field in m2m_fields_to_commit:
             getattr(self, field).commit()
 
-    def serializable_data(self):
+    async def asave(
+        self,
+        *,
+        bulk=False,
+        batch_size=None,
+        upsert=False,
+        commit_relations=True,
+        **kwargs,
+    ):
+        """
+        Asynchronous version of save(). The model's own fields are saved with
+        save() (so that any overrides of it still apply), and child relations are
+        then committed with the managers' asynchronous methods.
+        """
+        _, relations_to_commit, m2m_fields_to_commit = self._get_fields_to_commit(
+            kwargs.get("update_fields")
+        )
+
+        await sync_to_async(self.save)(commit_relations=False, **kwargs)
+
+        if not commit_relations:
+            return
+
+        if bulk or upsert:
+            await abulk_commit_child_relations(
+                [getattr(self, relation) for relation in relations_to_commit],
+                batch_size=batch_size,
+                upsert=upsert,
+            )
+        else:
+            for relation in relations_to_commit:
+                await getattr(self, relation).acommit()
+
+        for field in m2m_fields_to_commit:
+            await getattr(self, field).acommit()
+
+    def _get_fields_to_commit(self, update_fields):
+        # Split the update_fields argument of save() into the model's own fields
+        # (or None to save all of them), child relations and ParentalManyToManyFields
+        child_relation_info = get_child_relation_info(self)
+
+        if update_fields is None:
+            return (
+                None,
+                child_relation_info.relation_names,
+                child_relation_info.m2m_field_names,
+            )
+
+        real_update_fields = []
+        relations_to_commit = []
+        m2m_fields_to_commit = []
+        for field in update_fields:
+            if field in child_relation_info.relation_name_set:
+                relations_to_commit.append(field)
+            elif field in child_relation_info.m2m_field_name_set:
+                m2m_fields_to_commit.append(field)
+            else:
+                real_update_fields.append(field)
+        return real_update_fields, relations_to_commit, m2m_fields_to_commit
+
+    def serializable_data(self, chunk_size=None):
+        """
+        Return a JSON-like representation of this object and its child relations.
+        If chunk_size is given, child relations that are not held in memory are
+        streamed from the database in chunks of that size (with iterator()) rather
+        than being loaded all at once; this applies to this object's own relations,
+        not those of its children.
+        """
         obj = get_serializable_data_for_fields(self)
+        child_relation_info = get_child_relation_info(self)
+
+        def get_children(manager):
+            if chunk_size is None:
+                return manager.all()
+            return manager.iterator(chunk_size=chunk_size)
 
-        for rel in get_all_child_relations(self):
-            rel_name = rel.get_accessor_name()
-            children = getattr(self, rel_name).all()
+        for rel, rel_name in zip(
+            child_relation_info.relations, child_relation_info.relation_names
+        ):
+            children = get_children(getattr(self, rel_name))
 
             if hasattr(rel.related_model, "serializable_data"):
                 obj[rel_name] = [child.serializable_data() for child in children]
@@ -240,9 +630,9 @@ class ClusterableModel(models.Model):
                     get_serializable_data_for_fields(child) for child in children
                 ]
 
-        for field in get_all_child_m2m_relations(self):
+        for field in child_relation_info.m2m_fields:
             if field.serialize:
-                children = getattr(self, field.name).all()
+                children = get_children(getattr(self, field.name))
                 obj[field.name] = [child.pk for child in children]
 
         return obj
@@ -269,10 +659,11 @@ class ClusterableModel(models.Model):
         if obj is None:
             return None
 
-        child_relations = get_all_child_relations(cls)
+        child_relation_info = get_child_relation_info(cls)
 
-        for rel in child_relations:
-            rel_name = rel.get_accessor_name()
+        for rel, rel_name in zip(
+            child_relation_info.relations, child_relation_info.relation_names
+        ):
             try:
                 child_data_list = data[rel_name]
             except KeyError:
@@ -345,6 +736,10 @@ class ClusterableModel(models.Model):
         if not append:
             target_manager.clear()
 
+        # every copy is kept (in child_object_map, and to be added to the target in a
+        # single add() call), so there is no memory to be saved by streaming the
+        # source objects
+        copied_objects = []
         for child_object in source_manager.all().order_by("pk"):
             old_pk = child_object.pk
             is_saved = old_pk is not None
@@ -354,7 +749,7 @@ class ClusterableModel(models.Model):
             child_object.id = None
             child_object._state.adding = True
             setattr(child_object, parental_key_name, target.id)
-            target_manager.add(child_object)
+            copied_objects.append(child_object)
 
             # Add mapping to object
             # If the PK is none, add them into a list since there may be multiple of these
@@ -366,6 +761,9 @@ class ClusterableModel(models.Model):
 
                 child_object_map[(child_relation, None)].append(child_object)
 
+        if copied_objects:
+            target_manager.add(*copied_objects)
+
         if commit:
             target_manager.commit()
 
@@ -387,8 +785,11 @@ class ClusterableModel(models.Model):
         exclude = exclude or []
         child_object_map = {}
 
-        for child_relation in get_all_child_relations(self):
-            if child_relation.get_accessor_name() in exclude:
+        child_relation_info = get_child_relation_info(self)
+        for child_relation, name in zip(
+            child_relation_info.relations, child_relation_info.relation_names
+        ):
+            if name in exclude:
                 continue
 
             child_object_map.update(
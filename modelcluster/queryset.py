@@ -1,13 +1,15 @@
 from __future__ import unicode_literals
 
+import bisect
 import re
 
 from django.core.exceptions import FieldDoesNotExist
 from django.db.models import Model, Q, prefetch_related_objects
 
 from modelcluster.utils import (
-    NullRelationshipValueEncountered,
+    NULL_RELATIONSHIP_VALUE,
     extract_field_value,
+    get_field_value_getter,
     get_model_field,
     sort_by_fields,
 )
@@ -15,13 +17,13 @@ from modelcluster.utils import (
 
 # Constructor for test functions that determine whether an object passes some boolean condition
 def test_exact(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     if isinstance(value, Model):
         if value.pk is None:
             # comparing against an unsaved model, so objects need to match by reference
             def _test(obj):
-                try:
-                    other_value = extract_field_value(obj, attribute_name)
-                except NullRelationshipValueEncountered:
+                other_value = get_value(obj)
+                if other_value is NULL_RELATIONSHIP_VALUE:
                     return False
                 return other_value is value
 
@@ -32,9 +34,8 @@ def test_exact(model, attribute_name, value):
             # Additionally, where model inheritance is involved, we need to treat it as a
             # positive match if one is a subclass of the other
             def _test(obj):
-                try:
-                    other_value = extract_field_value(obj, attribute_name)
-                except NullRelationshipValueEncountered:
+                other_value = get_value(obj)
+                if other_value is NULL_RELATIONSHIP_VALUE:
                     return False
                 return value.pk == other_value.pk and (
                     isinstance(value, other_value.__class__)
@@ -49,9 +50,8 @@ def test_exact(model, attribute_name, value):
 
         # just a plain Python value = do a normal equality check
         def _test(obj):
-            try:
-                other_value = extract_field_value(obj, attribute_name)
-            except NullRelationshipValueEncountered:
+            other_value = get_value(obj)
+            if other_value is NULL_RELATIONSHIP_VALUE:
                 return False
             return other_value == typed_value
 
@@ -59,24 +59,23 @@ def test_exact(model, attribute_name, value):
 
 
 def test_iexact(model, attribute_name, match_value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(match_value)
 
     if match_value is None:
 
         def _test(obj):
-            try:
-                val = extract_field_value(obj, attribute_name)
-            except NullRelationshipValueEncountered:
+            val = get_value(obj)
+            if val is NULL_RELATIONSHIP_VALUE:
                 return False
             return val is None
     else:
         match_value = match_value.upper()
 
         def _test(obj):
-            try:
-                val = extract_field_value(obj, attribute_name)
-            except NullRelationshipValueEncountered:
+            val = get_value(obj)
+            if val is NULL_RELATIONSHIP_VALUE:
                 return False
             return val is not None and val.upper() == match_value
 
@@ -84,13 +83,13 @@ def test_iexact(model, attribute_name, match_value):
 
 
 def test_contains(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and match_value in val
 
@@ -98,13 +97,13 @@ def test_contains(model, attribute_name, value):
 
 
 def test_icontains(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value).upper()
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and match_value in val.upper()
 
@@ -112,13 +111,13 @@ def test_icontains(model, attribute_name, value):
 
 
 def test_lt(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val < match_value
 
@@ -126,13 +125,13 @@ def test_lt(model, attribute_name, value):
 
 
 def test_lte(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val <= match_value
 
@@ -140,13 +139,13 @@ def test_lte(model, attribute_name, value):
 
 
 def test_gt(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val > match_value
 
@@ -154,13 +153,13 @@ def test_gt(model, attribute_name, value):
 
 
 def test_gte(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val >= match_value
 
@@ -168,13 +167,13 @@ def test_gte(model, attribute_name, value):
 
 
 def test_in(model, attribute_name, value_list):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_values = set(field.to_python(val) for val in value_list)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val in match_values
 
@@ -182,13 +181,13 @@ def test_in(model, attribute_name, value_list):
 
 
 def test_startswith(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val.startswith(match_value)
 
@@ -196,13 +195,13 @@ def test_startswith(model, attribute_name, value):
 
 
 def test_istartswith(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value).upper()
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val.upper().startswith(match_value)
 
@@ -210,13 +209,13 @@ def test_istartswith(model, attribute_name, value):
 
 
 def test_endswith(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val.endswith(match_value)
 
@@ -224,13 +223,13 @@ def test_endswith(model, attribute_name, value):
 
 
 def test_iendswith(model, attribute_name, value):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     match_value = field.to_python(value).upper()
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val.upper().endswith(match_value)
 
@@ -238,14 +237,14 @@ def test_iendswith(model, attribute_name, value):
 
 
 def test_range(model, attribute_name, range_val):
+    get_value = get_field_value_getter(attribute_name)
     field = get_model_field(model, attribute_name)
     start_val = field.to_python(range_val[0])
     end_val = field.to_python(range_val[1])
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and val >= start_val and val <= end_val
 
@@ -253,10 +252,11 @@ def test_range(model, attribute_name, range_val):
 
 
 def test_isnull(model, attribute_name, sense):
+    get_value = get_field_value_getter(attribute_name)
+
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         if sense:
             return val is None
@@ -267,12 +267,12 @@ def test_isnull(model, attribute_name, sense):
 
 
 def test_regex(model, attribute_name, regex_string):
+    get_value = get_field_value_getter(attribute_name)
     regex = re.compile(regex_string)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and regex.search(val)
 
@@ -280,12 +280,12 @@ def test_regex(model, attribute_name, regex_string):
 
 
 def test_iregex(model, attribute_name, regex_string):
+    get_value = get_field_value_getter(attribute_name)
     regex = re.compile(regex_string, re.I)
 
     def _test(obj):
-        try:
-            val = extract_field_value(obj, attribute_name)
-        except NullRelationshipValueEncountered:
+        val = get_value(obj)
+        if val is NULL_RELATIONSHIP_VALUE:
             return False
         return val is not None and regex.search(val)
 
@@ -313,25 +313,225 @@ FILTER_EXPRESSION_TOKENS = {
 }
 
 
-def _build_test_function_from_filter(model, key_clauses, val):
-    # Translate a filter kwarg rule (e.g. foo__bar__exact=123) into a function which can
-    # take a model instance and return a boolean indicating whether it passes the rule
+# Estimated relative cost of evaluating each type of test on one object. Tests that
+# are combined in a filter are run cheapest first, so that the combination can often
+# be decided without running the expensive ones; the cheapest tests (exact matches)
+# also tend to be the most selective
+FILTER_EXPRESSION_COSTS = {
+    "exact": 1,
+    "in": 1,
+    "isnull": 1,
+    "lt": 2,
+    "lte": 2,
+    "gt": 2,
+    "gte": 2,
+    "range": 2,
+    "iexact": 3,
+    "contains": 3,
+    "icontains": 3,
+    "startswith": 3,
+    "istartswith": 3,
+    "endswith": 3,
+    "iendswith": 3,
+    "regex": 5,
+    "iregex": 5,
+}
+# additional cost of each relation (or date/time transform) traversed to reach the
+# value being tested
+TRAVERSAL_COST = 2
+
+
+def _parse_filter_key(model, key):
+    # Split a filter kwarg name (e.g. foo__bar__exact) into the attribute name to be
+    # interpretted by get_model_field() and extract_field_value() (foo__bar), and
+    # the type of test (exact)
     try:
-        get_model_field(model, "__".join(key_clauses))
+        get_model_field(model, key)
     except FieldDoesNotExist:
         # it is safe to assume the last clause indicates the type of test
-        field_match_found = False
-    else:
-        field_match_found = True
+        attribute_name, _, lookup = key.rpartition("__")
+        if attribute_name and lookup in FILTER_EXPRESSION_TOKENS:
+            return attribute_name, lookup
+    return key, "exact"
+
+
+def _build_test_function_from_filter(model, key, val):
+    # Translate a filter kwarg rule (e.g. foo__bar__exact=123) into a function which can
+    # take a model instance and return a boolean indicating whether it passes the rule.
+    # Returns a tuple of the estimated cost of the function and the function itself
+    attribute_name, lookup = _parse_filter_key(model, key)
+    cost = FILTER_EXPRESSION_COSTS[lookup] + TRAVERSAL_COST * attribute_name.count("__")
+    return cost, FILTER_EXPRESSION_TOKENS[lookup](model, attribute_name, val)
+
+
+def get_index_field_names(model):
+    """
+    Return the names of the fields that the FakeQuerySets of a relation on the given
+    model index for exact, in and range (lt, lte, gt, gte and range) lookups: the
+    primary key (as both 'pk' and the field's own name), followed by any listed in
+    the model's cluster_index_fields attribute.
+
+    Indexes are rebuilt when the relation is modified through its manager, but not
+    when the objects in it are modified in place, so cluster_index_fields should
+    only list fields whose values do not change while the objects are held in the
+    relation. The primary key is safe to index, as objects that had none when
+    indexed (and may have been saved directly since) are always tested by lookups
+    on it.
+    """
+    field_names = ["pk", model._meta.pk.name]
+    for field_name in getattr(model, "cluster_index_fields", ()):
+        if field_name not in field_names:
+            field_names.append(field_name)
+    return field_names
+
+
+class FakeQuerySetIndexes:
+    """
+    Hash and sorted indexes of the objects in a list by the values of the given
+    fields, for finding the objects that match exact, in and range lookups on those
+    fields without testing every object. An index is built when first needed, and all
+    indexes are discarded when get_version() returns a different value; whatever owns
+    the list must ensure that this happens whenever the list changes or is reordered.
+    """
+
+    def __init__(self, field_names, get_version):
+        self.field_names = frozenset(field_names)
+        self.get_version = get_version
+        self.version = None
+        self.indexes = {}
+        self.sorted_indexes = {}
+
+    def _check_version(self, results):
+        version = (self.get_version(), len(results))
+        if version != self.version:
+            self.version = version
+            self.indexes = {}
+            self.sorted_indexes = {}
+
+    def get_index(self, results, field_name):
+        """
+        Return a dict mapping each value of the named field to a list of the objects
+        in results that have that value, or None if the values cannot be indexed
+        """
+        self._check_version(results)
+
+        try:
+            return self.indexes[field_name]
+        except KeyError:
+            pass
+
+        get_value = get_field_value_getter(field_name)
+        index = {}
+        try:
+            for obj in results:
+                index.setdefault(get_value(obj), []).append(obj)
+        except TypeError:
+            # unhashable values
+            index = None
+        self.indexes[field_name] = index
+        return index
+
+    def get_sorted_index(self, results, field_name):
+        """
+        Return a (values, positions, null_positions) tuple of lists, where values
+        holds the non-null values of the named field in ascending order, positions
+        holds the position in results of the object that has each of them and
+        null_positions holds the positions of the objects with a null value; or None
+        if the values cannot be ordered
+        """
+        self._check_version(results)
+
+        try:
+            return self.sorted_indexes[field_name]
+        except KeyError:
+            pass
+
+        get_value = get_field_value_getter(field_name)
+        entries = []
+        null_positions = []
+        for position, obj in enumerate(results):
+            value = get_value(obj)
+            # null values never match a range lookup
+            if value is None or value is NULL_RELATIONSHIP_VALUE:
+                null_positions.append(position)
+            else:
+                entries.append((value, position))
+        try:
+            entries.sort(key=lambda entry: entry[0])
+        except TypeError:
+            # values of mutually unorderable types
+            sorted_index = None
+        else:
+            sorted_index = (
+                [value for value, position in entries],
+                [position for value, position in entries],
+                null_positions,
+            )
+        self.sorted_indexes[field_name] = sorted_index
+        return sorted_index
+
+
+def _get_sorted_index_slice(values, lookup, value):
+    # Return the (start, end) slice of the ascending list values that a range lookup
+    # matches, mirroring the comparisons made by the corresponding test functions
+    if lookup == "gt":
+        return bisect.bisect_right(values, value), len(values)
+    elif lookup == "gte":
+        return bisect.bisect_left(values, value), len(values)
+    elif lookup == "lt":
+        return 0, bisect.bisect_left(values, value)
+    elif lookup == "lte":
+        return 0, bisect.bisect_right(values, value)
+    else:  # range
+        lower, upper = value
+        return bisect.bisect_left(values, lower), bisect.bisect_right(values, upper)
+
+
+RANGE_LOOKUPS = frozenset(["gt", "gte", "lt", "lte", "range"])
+
+
+def _combine_test_functions(filters, connector=Q.AND, negated=False):
+    # Combine a list of (cost, function) tuples, as returned by
+    # _build_test_function_from_filter, into a single (cost, function) tuple that
+    # applies them with the given Q connector. The functions are run in order of
+    # cost, and only until the result is known
+    filters = sorted(filters, key=lambda cost_and_test: cost_and_test[0])
+    cost = sum(test_cost for test_cost, _ in filters)
+    tests = [test for _, test in filters]
+
+    if connector == Q.OR:
+
+        def combined_test(obj):
+            for test in tests:
+                if test(obj):
+                    return True
+            return False
+
+    elif connector == Q.AND:
+        if len(tests) == 1 and not negated:
+            return cost, tests[0]
+
+        def combined_test(obj):
+            for test in tests:
+                if not test(obj):
+                    return False
+            return True
 
-    if not field_match_found and key_clauses[-1] in FILTER_EXPRESSION_TOKENS:
-        constructor = FILTER_EXPRESSION_TOKENS[key_clauses.pop()]
     else:
-        constructor = test_exact
-    # recombine the remaining items to be interpretted
-    # by get_model_field() and extract_field_value()
-    attribute_name = "__".join(key_clauses)
-    return constructor(model, attribute_name, val)
+        # XOR: exactly one of the tests must pass
+
+        def combined_test(obj):
+            passed = False
+            for test in tests:
+                if test(obj):
+                    if passed:
+                        return False
+                    passed = True
+            return passed
+
+    if negated:
+        return cost, lambda obj: not combined_test(obj)
+    return cost, combined_test
 
 
 class FakeQuerySetIterable:
@@ -396,106 +596,222 @@ class FlatValuesListIterable(FakeQuerySetIterable):
 
 
 class FakeQuerySet(object):
-    def __init__(self, model, results):
+    def __init__(self, model, results, indexes=None, prepare_results=None):
         self.model = model
-        self.results = results
+        self._results = results
+        # an optional FakeQuerySetIndexes for results
+        self.indexes = indexes
+        # an optional function that is passed the results list before it is read, to
+        # bring it up to date in place (such as by running a deferred sort)
+        self.prepare_results = prepare_results
         self.dict_fields = []
         self.tuple_fields = []
         self.iterable_class = ModelIterable
 
+    @property
+    def results(self):
+        if self.prepare_results is not None:
+            self.prepare_results(self._results)
+        return self._results
+
+    @results.setter
+    def results(self, val):
+        self._results = val
+        self.prepare_results = None
+
     def all(self):
         return self
 
     def get_clone(self, results=None):
-        new = FakeQuerySet(self.model, results if results is not None else self.results)
+        if results is None:
+            # clones with the same results can share their indexes
+            new = FakeQuerySet(
+                self.model,
+                self._results,
+                indexes=self.indexes,
+                prepare_results=self.prepare_results,
+            )
+        else:
+            new = FakeQuerySet(self.model, results)
         new.dict_fields = self.dict_fields
         new.tuple_fields = self.tuple_fields
         new.iterable_class = self.iterable_class
         return new
 
     def resolve_q_object(self, q_object):
-        connector = q_object.connector
-        filters = []
-
-        def test(filters):
-            def test_inner(obj):
-                result = False
-                if connector == Q.AND:
-                    result = all([test(obj) for test in filters])
-                elif connector == Q.OR:
-                    result = any([test(obj) for test in filters])
-                else:
-                    result = sum([test(obj) for test in filters]) == 1
-                if q_object.negated:
-                    return not result
-                return result
-
-            return test_inner
+        """
+        Return a function that takes a model instance and returns whether it
+        matches the given Q object
+        """
+        return self._resolve_q_object(q_object)[1]
 
+    def _resolve_q_object(self, q_object):
+        # As resolve_q_object(), but returning a tuple of the function's estimated
+        # cost and the function
+        filters = []
         for child in q_object.children:
             if isinstance(child, Q):
-                filters.append(self.resolve_q_object(child))
+                filters.append(self._resolve_q_object(child))
             else:
-                key_clauses, val = child
-                filters.append(
-                    _build_test_function_from_filter(
-                        self.model, key_clauses.split("__"), val
-                    )
-                )
+                key, val = child
+                filters.append(_build_test_function_from_filter(self.model, key, val))
 
-        return test(filters)
+        return _combine_test_functions(
+            filters, q_object.connector, negated=q_object.negated
+        )
 
-    def _get_filters(self, *args, **kwargs):
-        # a list of test functions; objects must pass all tests to be included
-        # in the filtered list
-        filters = []
+    def _get_filter_kwargs(self, kwargs):
+        # Return the given filter kwargs with the values of in and range lookups
+        # read into lists, as they are used both to build the test function and to
+        # look up candidates in the indexes, and may be one-shot iterables
+        filter_kwargs = {}
+        for key, val in kwargs.items():
+            if (
+                key.endswith(("__in", "__range"))
+                and not isinstance(val, (list, tuple))
+                and _parse_filter_key(self.model, key)[1] in ("in", "range")
+            ):
+                val = list(val)
+            filter_kwargs[key] = val
+        return filter_kwargs
+
+    def _get_filter_test(self, *args, **kwargs):
+        # a single test function, which objects must pass to be included in the
+        # filtered list
+        filters = [self._resolve_q_object(q_object) for q_object in args]
+
+        for key, val in kwargs.items():
+            filters.append(_build_test_function_from_filter(self.model, key, val))
 
-        for q_object in args:
-            filters.append(self.resolve_q_object(q_object))
+        return _combine_test_functions(filters)[1]
 
+    def _get_candidates(self, kwargs):
+        # Return the objects in results that could match the given filter kwargs,
+        # in order: if any of them are exact, in or range lookups on an indexed field,
+        # only the objects found in the index (for the most selective one) need
+        # testing. Lookups against model instances are not indexed, as they also
+        # match instances of related classes in a model inheritance hierarchy
+        if self.indexes is None:
+            return self.results
+
+        pk_names = ("pk", self.model._meta.pk.name)
+        candidates = None
         for key, val in kwargs.items():
-            filters.append(
-                _build_test_function_from_filter(self.model, key.split("__"), val)
-            )
+            attribute_name, lookup = _parse_filter_key(self.model, key)
+            if attribute_name not in self.indexes.field_names:
+                continue
+            # objects that had no primary key when indexed may have been saved since
+            is_pk = attribute_name in pk_names
+
+            if lookup in RANGE_LOOKUPS:
+                matches = self._get_range_candidates(
+                    attribute_name, lookup, val, include_nulls=is_pk
+                )
+                if matches is not None and (
+                    candidates is None or len(matches) < len(candidates)
+                ):
+                    candidates = matches
+                continue
+            elif lookup not in ("exact", "in"):
+                continue
+
+            index = self.indexes.get_index(self.results, attribute_name)
+            if index is None:
+                continue
+
+            values = [val] if lookup == "exact" else list(val)
+            if any(isinstance(value, Model) for value in values):
+                continue
+
+            field = get_model_field(self.model, attribute_name)
+            matches = []
+            for value in values:
+                try:
+                    matches.extend(index.get(field.to_python(value), ()))
+                except TypeError:
+                    # unhashable value, which cannot match any indexed one
+                    pass
+            if is_pk and None not in values:
+                matches.extend(index.get(None, ()))
+
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+
+        if candidates is None:
+            return self.results
+        if len(candidates) > 1:
+            # restore the original order (and remove duplicates)
+            candidate_ids = {id(obj) for obj in candidates}
+            candidates = [obj for obj in self.results if id(obj) in candidate_ids]
+        return candidates
+
+    def _get_range_candidates(self, attribute_name, lookup, val, include_nulls=False):
+        # Return the objects in results, in order, whose values of the named field
+        # fall within the bounds of the given range lookup, as found by bisecting
+        # the field's sorted index, along with those whose value was null when
+        # indexed if include_nulls is true; or None if the index cannot be used
+        if lookup == "range":
+            bounds = list(val)
+        else:
+            bounds = [val]
+        if any(isinstance(bound, Model) or bound is None for bound in bounds):
+            return None
 
-        return filters
+        sorted_index = self.indexes.get_sorted_index(self.results, attribute_name)
+        if sorted_index is None:
+            return None
+        values, positions, null_positions = sorted_index
+
+        field = get_model_field(self.model, attribute_name)
+        bounds = [field.to_python(bound) for bound in bounds]
+        try:
+            start, end = _get_sorted_index_slice(
+                values, lookup, bounds if lookup == "range" else bounds[0]
+            )
+        except TypeError:
+            # bounds that cannot be compared with the indexed values
+            return None
+        positions = positions[start:end]
+        if include_nulls:
+            positions += null_positions
+        return [self.results[position] for position in sorted(positions)]
 
     def filter(self, *args, **kwargs):
-        filters = self._get_filters(*args, **kwargs)
+        kwargs = self._get_filter_kwargs(kwargs)
+        test = self._get_filter_test(*args, **kwargs)
 
         clone = self.get_clone(
-            results=[
-                obj for obj in self.results if all([test(obj) for test in filters])
-            ]
+            results=[obj for obj in self._get_candidates(kwargs) if test(obj)]
         )
         return clone
 
     def exclude(self, *args, **kwargs):
-        filters = self._get_filters(*args, **kwargs)
+        test = self._get_filter_test(*args, **kwargs)
 
-        clone = self.get_clone(
-            results=[
-                obj for obj in self.results if not all([test(obj) for test in filters])
-            ]
-        )
+        clone = self.get_clone(results=[obj for obj in self.results if not test(obj)])
         return clone
 
     def get(self, *args, **kwargs):
-        clone = self.filter(*args, **kwargs)
-        result_count = clone.count()
+        kwargs = self._get_filter_kwargs(kwargs)
+        test = self._get_filter_test(*args, **kwargs)
+
+        # stop looking once a second match is found
+        matches = []
+        for obj in self._get_candidates(kwargs):
+            if test(obj):
+                matches.append(obj)
+                if len(matches) > 1:
+                    raise self.model.MultipleObjectsReturned(
+                        "get() returned more than one %s -- it returned more than 1!"
+                        % self.model._meta.object_name
+                    )
 
-        if result_count == 0:
+        if not matches:
             raise self.model.DoesNotExist(
                 "%s matching query does not exist." % self.model._meta.object_name
             )
-        elif result_count == 1:
-            for result in clone:
-                return result
-        else:
-            raise self.model.MultipleObjectsReturned(
-                "get() returned more than one %s -- it returned %s!"
-                % (self.model._meta.object_name, result_count)
-            )
+        for result in self.get_clone(results=matches):
+            return result
 
     def count(self):
         return len(self.results)
@@ -579,6 +895,13 @@ class FakeQuerySet(object):
         """
         return self.get_clone(results=[])
 
+    def iterator(self, chunk_size=None):
+        """
+        Iterate over the results. These are already in memory, so chunk_size is
+        accepted for compatibility with QuerySet.iterator() but has no effect.
+        """
+        return iter(self)
+
     # a standard QuerySet will store the results in _result_cache on running the query;
     # this is effectively the same as self.results on a FakeQuerySet, and so we'll make
     # _result_cache an alias of self.results for the benefit of Django internals that
@@ -1,6 +1,11 @@
+import bisect
+import copy
 import datetime
+from decimal import Decimal
 from functools import lru_cache
+from operator import attrgetter
 import random
+import uuid
 from django.core.exceptions import FieldDoesNotExist
 from django.db.models import (
     DateField,
@@ -10,6 +15,8 @@ from django.db.models import (
     Model,
     TimeField,
 )
+from django.db.models.deletion import Collector
+from django.db.models.fields.files import FieldFile
 
 from modelcluster import datetime_utils
 
@@ -25,6 +32,11 @@ class NullRelationshipValueEncountered(Exception):
     pass
 
 
+# returned by the functions from get_field_value_getter() where extract_field_value()
+# would raise NullRelationshipValueEncountered
+NULL_RELATIONSHIP_VALUE = object()
+
+
 class TraversedRelationship:
     __slots__ = ["from_model", "field"]
 
@@ -104,6 +116,9 @@ def get_model_field(model, name):
                         to_field=field_name,
                     )
                 )
+        if field_name == "pk":
+            field = subject_model._meta.pk
+            continue
         try:
             field = subject_model._meta.get_field(field_name)
         except FieldDoesNotExist:
@@ -192,36 +207,471 @@ def extract_field_value(
     return value
 
 
+@lru_cache(maxsize=None)
+def get_field_value_getter(key):
+    """
+    Return a function that takes an object and returns the value that
+    ``extract_field_value(obj, key)`` would, with the key split into a chain of
+    attribute lookups once, rather than on every call. Where extract_field_value
+    would raise ``NullRelationshipValueEncountered``, the function returns
+    ``NULL_RELATIONSHIP_VALUE`` instead, so that filtering objects does not incur
+    the cost of raising and catching exceptions.
+    """
+    steps = [_get_value_step(segment) for segment in key.split(REL_DELIMETER)]
+    *traversal_steps, last_step = steps
+
+    def raise_field_does_not_exist(obj):
+        raise FieldDoesNotExist(
+            "'{name}' is not a valid field name for {model}".format(
+                name=key, model=type(obj)
+            )
+        )
+
+    if not traversal_steps:
+
+        def get_value(obj):
+            try:
+                return last_step(obj)
+            except AttributeError:
+                raise_field_does_not_exist(obj)
+
+    else:
+
+        def get_value(obj):
+            try:
+                source = obj
+                for step in traversal_steps:
+                    source = step(source)
+                    if source is None:
+                        return NULL_RELATIONSHIP_VALUE
+                return last_step(source)
+            except AttributeError:
+                raise_field_does_not_exist(obj)
+
+    return get_value
+
+
+def _get_value_step(segment):
+    # Return a function that performs one step of the lookups from
+    # get_field_value_getter(). Only segments named after a date/time transform need
+    # to check the type of the value they are applied to
+    if segment not in datetime_utils.DATETIMEFIELD_TRANSFORM_EXPRESSIONS:
+        return attrgetter(segment)
+
+    def get_transform_or_attribute(source):
+        if (
+            (
+                isinstance(source, datetime.datetime)
+                and segment in datetime_utils.DATETIMEFIELD_TRANSFORM_EXPRESSIONS
+            )
+            or (
+                isinstance(source, datetime.date)
+                and segment in datetime_utils.DATEFIELD_TRANSFORM_EXPRESSIONS
+            )
+            or (
+                isinstance(source, datetime.time)
+                and segment in datetime_utils.TIMEFIELD_TRANSFORM_EXPRESSIONS
+            )
+        ):
+            return datetime_utils.derive_from_value(source, segment)
+        return getattr(source, segment)
+
+    return get_transform_or_attribute
+
+
+def get_object_key(obj):
+    """
+    Return a hashable key for a model instance, such that two instances have equal
+    keys if and only if they are equal according to Model.__eq__: saved instances are
+    keyed on their concrete model and primary key, and unsaved ones on their identity
+    """
+    pk = getattr(obj, "pk", None)
+    if pk is None:
+        return id(obj)
+    return (obj._meta.concrete_model, pk)
+
+
+class ObjectPositions:
+    """
+    An index of the position of each object in the list `items` by get_object_key(),
+    for adding objects to the list with replace_or_append() in constant time per
+    object. The index is built in time linear in the length of the list, and can be
+    kept for further calls as long as the list is not otherwise modified (although
+    objects in it may be saved in the meantime, changing their keys).
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.positions = {}
+        # positions of the objects that were unsaved, and so keyed on their identity,
+        # when they were indexed
+        self.unsaved_positions = []
+        for i, item in enumerate(items):
+            self._add_position(get_object_key(item), i)
+
+    def _add_position(self, key, position):
+        if key not in self.positions:
+            self.positions[key] = position
+            if isinstance(key, int):
+                self.unsaved_positions.append(position)
+
+    def _find(self, key):
+        # Return the position of the first object in the list with the given key, or
+        # None if there is none
+        position = self.positions.get(key)
+        if position is not None:
+            if get_object_key(self.items[position]) == key:
+                return position
+        elif isinstance(key, int) or not any(
+            isinstance(get_object_key(self.items[i]), tuple)
+            for i in self.unsaved_positions
+        ):
+            return None
+
+        # an object has been saved since it was indexed
+        self.__init__(self.items)
+        return self.positions.get(key)
+
+    def replace_or_append(self, new_items):
+        """
+        Add each of new_items to the list in place, replacing the first object in the
+        list that is equal to it if there is one, or appending it otherwise
+        """
+        items = self.items
+        for new_item in new_items:
+            key = get_object_key(new_item)
+            position = self._find(key)
+            if position is None:
+                self._add_position(key, len(items))
+                items.append(new_item)
+            else:
+                items[position] = new_item
+
+
+def replace_or_append_objects(items, new_items):
+    """
+    Add each of new_items to the list `items` in place, replacing the first object
+    in the list that is equal to it if there is one, or appending it otherwise. Runs
+    in time linear in the combined length of the lists.
+    """
+    ObjectPositions(items).replace_or_append(new_items)
+
+
+def remove_objects(items, items_to_remove):
+    """
+    Remove all objects from the list `items` in place that are equal to one of
+    items_to_remove. Runs in time linear in the combined length of the lists.
+    """
+    keys_to_remove = {get_object_key(item) for item in items_to_remove}
+    if keys_to_remove:
+        items[:] = [
+            item for item in items if get_object_key(item) not in keys_to_remove
+        ]
+
+
+def diff_object_lists(live_pks, final_items):
+    """
+    Compare the set of primary keys of a relation's objects currently in the database
+    against the list of objects that should exist after committing. Return a tuple of
+    the live primary keys that are absent from the final list, the final objects that
+    are not live (including unsaved ones), and the final objects that are live.
+
+    All objects are assumed to belong to the same database table, so that primary key
+    equality corresponds to model equality. Runs in linear time.
+    """
+    items_to_create = []
+    items_to_update = []
+    final_pks = set()
+    for item in final_items:
+        pk = item.pk
+        if pk is None:
+            items_to_create.append(item)
+        else:
+            final_pks.add(pk)
+            if pk in live_pks:
+                items_to_update.append(item)
+            else:
+                items_to_create.append(item)
+
+    pks_to_delete = [pk for pk in live_pks if pk not in final_pks]
+
+    return pks_to_delete, items_to_create, items_to_update
+
+
+def delete_querysets(querysets):
+    """
+    Delete the objects in the given querysets (which may be of different models),
+    along with any objects that cascade from them. As with QuerySet.delete(), this
+    bypasses the models' delete() methods, but sends the pre_delete / post_delete
+    signals. All querysets for the same database share a single deletion collector,
+    so that the objects of each model are deleted together.
+    """
+    collectors = {}
+    for queryset in querysets:
+        try:
+            collector = collectors[queryset.db]
+        except KeyError:
+            collector = collectors[queryset.db] = Collector(using=queryset.db)
+        collector.collect(queryset.order_by())
+
+    for collector in collectors.values():
+        collector.delete()
+
+
+def _get_longest_increasing_indexes(values):
+    # Return the set of indexes of a longest strictly increasing subsequence of
+    # values, ignoring None entries, in O(n log n) time
+    tail_values = []  # the smallest tail value of an increasing run of each length
+    tail_indexes = []
+    previous_indexes = {}
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        length = bisect.bisect_left(tail_values, value)
+        previous_indexes[i] = tail_indexes[length - 1] if length else None
+        if length == len(tail_values):
+            tail_values.append(value)
+            tail_indexes.append(i)
+        else:
+            tail_values[length] = value
+            tail_indexes[length] = i
+
+    indexes = set()
+    i = tail_indexes[-1] if tail_indexes else None
+    while i is not None:
+        indexes.add(i)
+        i = previous_indexes[i]
+    return indexes
+
+
+def get_gapped_sort_order_values(current_values, gap):
+    """
+    Given the current sort order values of a list of objects (None for objects that
+    do not have one yet), listed in their new order, return a list of sort order
+    values that puts them in that order while changing as few of the existing values
+    as possible. Values are assigned in steps of `gap`, so that there is usually room
+    to move or insert objects between two others without renumbering the rest; only
+    when there is no room are all values reassigned, evenly spaced.
+    """
+    new_values = list(current_values)
+    kept_indexes = _get_longest_increasing_indexes(current_values)
+
+    i = 0
+    count = len(new_values)
+    while i < count:
+        if i in kept_indexes:
+            i += 1
+            continue
+
+        # find the run of objects to be renumbered, and the values either side of it
+        start = i
+        while i < count and i not in kept_indexes:
+            i += 1
+        run_length = i - start
+        lower = new_values[start - 1] if start > 0 else None
+        upper = new_values[i] if i < count else None
+
+        if upper is None:
+            if lower is None:
+                lower = 0
+            step = gap
+        else:
+            if lower is None:
+                # leave room below the first value, but don't go below zero
+                lower = max(upper - gap * (run_length + 1), -1)
+            step = min(gap, (upper - lower) // (run_length + 1))
+            if step < 1:
+                # no room left between the neighbouring values
+                return [(j + 1) * gap for j in range(count)]
+
+        for j in range(run_length):
+            new_values[start + j] = lower + step * (j + 1)
+
+    return new_values
+
+
 def sort_by_fields(items, fields):
     """
     Sort a list of objects on the given fields. The field list works analogously to
     queryset.order_by(*fields): each field is either a property of the object,
     or is prefixed by '-' (e.g. '-name') to indicate reverse ordering.
     """
-    # To get the desired behaviour, we need to order by keys in reverse order
-    # See: https://docs.python.org/2/howto/sorting.html#sort-stability-and-complex-sorts
-    for key in reversed(fields):
-        if key == "?":
-            random.shuffle(items)
-            continue
+    fields = tuple(fields)
+    if "?" in fields:
+        # random ordering overrides any fields that follow it, and leaves the
+        # preceding ones to order the shuffled list
+        random.shuffle(items)
+        fields = fields[: fields.index("?")]
+    if fields and items:
+        get_sort_key, reverse = _get_sort_key(type(items[0]), fields)
+        items.sort(key=get_sort_key, reverse=reverse)
 
-        # Check if this key has been reversed
-        reverse = False
-        if key[0] == "-":
-            reverse = True
-            key = key[1:]
-
-        def get_sort_value(item):
-            # Use a tuple of (v is not None, v) as the key, to ensure that None sorts before other values,
-            # as comparing directly with None breaks on python3
-            value = extract_field_value(
-                item,
-                key,
-                pk_only=True,
-                suppress_fielddoesnotexist=True,
-                suppress_nullrelationshipvalueencountered=True,
-            )
+
+class _ReversedSortValue:
+    # Wrapper for a sort key component that inverts its ordering, for fields sorted
+    # in descending order among others sorted in ascending order
+    __slots__ = ["value"]
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _get_sort_value_getter(model, key):
+    # Return a function that returns the value of the given field on an object as a
+    # (v is not None, v) tuple, to ensure that None sorts before other values, as
+    # comparing directly with None breaks on python3. Related objects are replaced
+    # by their pk, and missing fields or null relationships give None, as for
+    # extract_field_value(obj, key, pk_only=True) with both suppress_ flags set
+    field = None
+    if REL_DELIMETER not in key and issubclass(model, Model):
+        try:
+            field = model._meta.get_field(key)
+        except FieldDoesNotExist:
+            pass
+    if field is not None and field.concrete and not field.is_relation:
+        # a plain value, which needs no traversal of relations
+        get_attribute = attrgetter(field.attname)
+
+        def get_sort_value(obj):
+            try:
+                value = get_attribute(obj)
+            except AttributeError:
+                # an object of a parent model, in a list of mixed subclasses
+                return (False, None)
             return (value is not None, value)
 
-        # Sort items
-        items.sort(key=get_sort_value, reverse=reverse)
+        return get_sort_value
+
+    get_value = get_field_value_getter(key)
+
+    def get_sort_value(obj):
+        try:
+            value = get_value(obj)
+        except FieldDoesNotExist:
+            return (False, None)
+        if value is NULL_RELATIONSHIP_VALUE:
+            return (False, None)
+        if isinstance(value, Model):
+            value = value.pk
+        return (value is not None, value)
+
+    return get_sort_value
+
+
+@lru_cache(maxsize=None)
+def _get_sort_key(model, fields):
+    # Return a (key function, reverse) tuple for sorting a list of objects of the
+    # given model in a single pass on the given tuple of fields, as passed to
+    # sort_by_fields
+    getters = []
+    descending = []
+    for field in fields:
+        if field[0] == "-":
+            getters.append(_get_sort_value_getter(model, field[1:]))
+            descending.append(True)
+        else:
+            getters.append(_get_sort_value_getter(model, field))
+            descending.append(False)
+
+    if len(set(descending)) > 1:
+        # mixed directions: invert the descending components of an ascending sort
+        getters = [
+            (lambda obj, get=get: _ReversedSortValue(get(obj))) if is_reversed else get
+            for get, is_reversed in zip(getters, descending)
+        ]
+        reverse = False
+    else:
+        # list.sort(reverse=True) keeps equal items in their original order too
+        reverse = descending[0]
+
+    if len(getters) == 1:
+        return getters[0], reverse
+
+    def get_sort_key(obj):
+        return tuple([get(obj) for get in getters])
+
+    return get_sort_key, reverse
+
+
+def _get_comparable_value(value):
+    if isinstance(value, FieldFile):
+        # A file that has been assigned but not yet written to storage must be saved,
+        # even if its name happens to match the previous one
+        return (value.name, value._committed)
+    return value
+
+
+# Types of field value that cannot be changed in place, so can be recorded in a
+# snapshot without copying
+IMMUTABLE_VALUE_TYPES = frozenset(
+    [
+        type(None),
+        bool,
+        int,
+        float,
+        str,
+        bytes,
+        Decimal,
+        datetime.date,
+        datetime.datetime,
+        datetime.time,
+        datetime.timedelta,
+        uuid.UUID,
+    ]
+)
+
+
+def _get_snapshot_value(value):
+    value = _get_comparable_value(value)
+    if type(value) in IMMUTABLE_VALUE_TYPES:
+        return value
+    # copy any other value (e.g. from a JSONField, or a custom field holding a
+    # mutable object), so that in-place changes are not reflected in the snapshot
+    try:
+        return copy.deepcopy(value)
+    except Exception:
+        # a value that cannot be copied cannot be checked for in-place changes, so
+        # record one that never compares equal to it, for it to be always written
+        return object()
+
+
+def get_field_values_snapshot(obj):
+    """
+    Return a record of the current values of the concrete fields on ``obj``, for
+    passing to ``get_changed_field_names`` later on. Deferred fields are omitted.
+    """
+    values = obj.__dict__
+    return {
+        field.attname: _get_snapshot_value(values[field.attname])
+        for field in obj._meta.concrete_fields
+        if field.attname in values
+    }
+
+
+def get_changed_field_names(obj, snapshot):
+    """
+    Return a list of names of the concrete fields on ``obj`` whose values differ from
+    those recorded by ``get_field_values_snapshot``. Fields that are still deferred are
+    considered unchanged.
+    """
+    values = obj.__dict__
+    changed_field_names = []
+    for field in obj._meta.concrete_fields:
+        if field.primary_key or field.attname not in values:
+            continue
+        try:
+            original_value = snapshot[field.attname]
+        except KeyError:
+            # field was deferred when the snapshot was taken, and has been loaded
+            # or assigned since
+            changed_field_names.append(field.name)
+            continue
+        if _get_comparable_value(values[field.attname]) != original_value:
+            changed_field_names.append(field.name)
+    return changed_field_names
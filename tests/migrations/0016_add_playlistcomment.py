@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:21
+
+import django.db.models.deletion
+import modelcluster.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tests", "0015_add_playlist"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaylistComment",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text", models.CharField(max_length=255)),
+                (
+                    "playlist",
+                    modelcluster.fields.ParentalKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        overlay_changes=True,
+                        related_name="comments",
+                        to="tests.playlist",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["text"],
+            },
+        ),
+    ]
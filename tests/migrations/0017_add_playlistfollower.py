@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:25
+
+import django.db.models.deletion
+import modelcluster.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tests", "0016_add_playlistcomment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaylistFollower",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "playlist",
+                    modelcluster.fields.ParentalKey(
+                        auto_prefetch=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="followers",
+                        to="tests.playlist",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -7,12 +7,14 @@ from taggit.managers import TaggableManager
 from taggit.models import TaggedItemBase
 
 from modelcluster.fields import ParentalKey, ParentalManyToManyField
-from modelcluster.models import ClusterableModel
+from modelcluster.models import ClusterableManager, ClusterableModel
 
 
 class Band(ClusterableModel):
     name = models.CharField(max_length=255)
 
+    objects = ClusterableManager()
+
     def __str__(self):
         return self.name
 
@@ -309,3 +311,58 @@ class Person(ClusterableModel):
 
     class Meta:
         ordering = ["id"]
+
+
+class Playlist(ClusterableModel):
+    name = models.CharField(max_length=255)
+
+    objects = ClusterableManager()
+
+    def __str__(self):
+        return self.name
+
+
+class PlaylistEntry(models.Model):
+    playlist = ParentalKey(Playlist, related_name="entries", on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    sort_order = models.IntegerField(null=True, blank=True, editable=False)
+
+    sort_order_field = "sort_order"
+    sort_order_gap = 100
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        ordering = ["sort_order"]
+
+
+class PlaylistComment(models.Model):
+    playlist = ParentalKey(
+        Playlist,
+        related_name="comments",
+        on_delete=models.CASCADE,
+        overlay_changes=True,
+    )
+    text = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.text
+
+    class Meta:
+        ordering = ["text"]
+
+
+class PlaylistFollower(models.Model):
+    playlist = ParentalKey(
+        Playlist,
+        related_name="followers",
+        on_delete=models.CASCADE,
+        auto_prefetch=True,
+    )
+    name = models.CharField(max_length=255)
+
+    cluster_index_fields = ["name"]
+
+    def __str__(self):
+        return self.name
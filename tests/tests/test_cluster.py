@@ -1,15 +1,34 @@
 from __future__ import unicode_literals
 
+import copy
 import datetime
+import gc
 import itertools
+import pickle
+import weakref
+from unittest import mock
 
+from django.core.exceptions import FieldDoesNotExist
 from django.test import TestCase
 from django.db import IntegrityError
-from django.db.models import Prefetch, Q
+from django.db.models import Prefetch, Q, QuerySet
 
-from modelcluster.models import get_all_child_relations
-from modelcluster.queryset import FakeQuerySet
-from modelcluster.utils import ManyToManyTraversalError
+from modelcluster.models import (
+    get_all_child_relations,
+    get_child_relation_info,
+    get_cluster_prefetch_lookups,
+)
+from modelcluster.queryset import FakeQuerySet, _combine_test_functions
+from modelcluster.utils import (
+    NULL_RELATIONSHIP_VALUE,
+    ManyToManyTraversalError,
+    ObjectPositions,
+    extract_field_value,
+    get_field_value_getter,
+    remove_objects,
+    replace_or_append_objects,
+    sort_by_fields,
+)
 
 from tests.models import (
     Band,
@@ -31,6 +50,10 @@ from tests.models import (
     Dish,
     MenuItem,
     Wine,
+    Song,
+    Playlist,
+    PlaylistEntry,
+    PlaylistFollower,
 )
 
 
@@ -1514,6 +1537,781 @@ class GetAllChildRelationsTest(TestCase):
             set(["tagged_items", "reviews", "menu_items"]),
         )
 
+    def test_child_relation_info_is_computed_once_per_model(self):
+        info = get_child_relation_info(Restaurant)
+        self.assertIs(info, get_child_relation_info(Restaurant))
+        self.assertIs(info, get_child_relation_info(Restaurant(name="Ivy")))
+        self.assertEqual(
+            {"tagged_items", "reviews", "menu_items"}, info.relation_name_set
+        )
+        self.assertEqual(
+            ("authors", "categories", "related_articles"),
+            get_child_relation_info(Article).m2m_field_names,
+        )
+
+
+class FakeQuerySetCachingTest(TestCase):
+    def test_fake_queryset_is_reused_until_object_list_is_replaced(self):
+        beatles = Band(
+            name="The Beatles", members=[BandMember(id=1, name="John Lennon")]
+        )
+        members = beatles.members.all()
+        self.assertIs(members, beatles.members.all())
+        self.assertIsNot(members, beatles.albums.all())
+
+        beatles.members.add(BandMember(name="Paul McCartney"))
+        self.assertIs(members, beatles.members.all())
+        self.assertEqual(2, len(members))
+
+        beatles.members = [BandMember(name="Ringo Starr")]
+        self.assertIsNot(members, beatles.members.all())
+        self.assertEqual(["Ringo Starr"], [m.name for m in beatles.members.all()])
+
+        author = Author.objects.create(name="Author 1")
+        article = Article(title="Test Title", authors=[author])
+        self.assertIs(article.authors.all(), article.authors.all())
+
+    def test_cached_fake_queryset_does_not_keep_instance_alive(self):
+        beatles = Band(name="The Beatles")
+        self.assertEqual([], list(beatles.members.all()))
+        self.assertEqual([], list(beatles.albums.all()))
+        beatles_ref = weakref.ref(beatles)
+
+        gc.disable()
+        try:
+            del beatles
+            self.assertIsNone(beatles_ref())
+        finally:
+            gc.enable()
+
+    def test_copies_get_their_own_fake_querysets(self):
+        beatles = Band(
+            name="The Beatles", members=[BandMember(id=1, name="John Lennon")]
+        )
+        members = beatles.members.all()
+
+        for beatles_copy in [
+            copy.copy(beatles),
+            copy.deepcopy(beatles),
+            pickle.loads(pickle.dumps(beatles)),
+        ]:
+            self.assertIsNot(members, beatles_copy.members.all())
+            self.assertEqual(
+                ["John Lennon"], [m.name for m in beatles_copy.members.all()]
+            )
+
+    def test_fake_queryset_is_not_shared_through_copied_dict(self):
+        beatles = Band(name="The Beatles", members=[BandMember(name="John Lennon")])
+        members = beatles.members.all()
+
+        other = Band()
+        other.__dict__.update(beatles.__dict__)
+        self.assertIsNot(members, other.members.all())
+
+
+class ChunkedIterationTest(TestCase):
+    def setUp(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+                BandMember(name="George Harrison"),
+            ],
+        )
+        beatles.save()
+        self.beatles = Band.objects.get(pk=beatles.pk)
+
+    def test_live_relation_is_streamed_without_caching(self):
+        with self.assertNumQueries(1):
+            names = [
+                member.name for member in self.beatles.members.iterator(chunk_size=2)
+            ]
+        self.assertEqual(
+            ["George Harrison", "John Lennon", "Paul McCartney"], sorted(names)
+        )
+        self.assertFalse(self.beatles.members.is_deferring)
+
+    def test_in_memory_relation_is_iterated_without_queries(self):
+        self.beatles.members.add(BandMember(name="Ringo Starr"))
+        with self.assertNumQueries(0):
+            members = list(self.beatles.members.iterator(chunk_size=2))
+        self.assertEqual(4, len(members))
+        self.assertEqual(members, list(self.beatles.members.all().iterator()))
+
+    def test_prefetched_relation_is_iterated_without_queries(self):
+        beatles = Band.objects.prefetch_related("members").get(pk=self.beatles.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(3, len(list(beatles.members.iterator())))
+
+    def test_parental_many_to_many_iterator(self):
+        author = Author.objects.create(name="Author 1")
+        article = Article(title="Test Title", authors=[author])
+        self.assertEqual([author], list(article.authors.iterator()))
+        article.save()
+
+        article = Article.objects.get(pk=article.pk)
+        self.assertEqual([author], list(article.authors.iterator(chunk_size=1)))
+
+    def test_serializable_data_streams_children_on_request(self):
+        # one query per relation (members and albums)
+        with self.assertNumQueries(2):
+            data = self.beatles.serializable_data()
+        self.assertEqual(3, len(data["members"]))
+
+        with mock.patch.object(
+            QuerySet, "iterator", autospec=True, side_effect=QuerySet.iterator
+        ) as iterator:
+            self.assertEqual(data, self.beatles.serializable_data(chunk_size=2))
+        self.assertEqual(2, iterator.call_count)
+        self.assertEqual(2, iterator.call_args.kwargs["chunk_size"])
+
+    def test_copy_child_relation_keeps_source_order(self):
+        target = Band(name="The Beatles (copy)")
+        child_object_map = self.beatles.copy_child_relation("members", target)
+        self.assertEqual(3, len(child_object_map))
+        self.assertEqual(
+            [member.name for member in self.beatles.members.order_by("pk")],
+            [member.name for member in target.members.all()],
+        )
+        self.assertFalse(self.beatles.members.is_deferring)
+
+
+class PrefetchClusterTest(TestCase):
+    def setUp(self):
+        for band_name in ["The Beatles", "The Rolling Stones"]:
+            Band(
+                name=band_name,
+                members=[BandMember(name="%s member" % band_name)],
+                albums=[
+                    Album(
+                        name="%s album %d" % (band_name, i),
+                        sort_order=i,
+                        songs=[Song(name="Song %d" % i, sort_order=1)],
+                    )
+                    for i in range(2)
+                ],
+            ).save()
+
+    def test_get_cluster_prefetch_lookups(self):
+        self.assertEqual(
+            ["members", "albums", "albums__songs"], get_cluster_prefetch_lookups(Band)
+        )
+        self.assertEqual(
+            ["members", "albums"], get_cluster_prefetch_lookups(Band, depth=1)
+        )
+        self.assertEqual(
+            ["albums", "albums__songs"],
+            get_cluster_prefetch_lookups(Band, relations=["albums"]),
+        )
+        self.assertEqual(
+            ["authors"], get_cluster_prefetch_lookups(Article, relations=["authors"])
+        )
+        with self.assertRaises(LookupError):
+            get_cluster_prefetch_lookups(Band, relations=["songs"])
+
+    def test_prefetch_cluster(self):
+        # one query for the bands, and one for each relation
+        with self.assertNumQueries(4):
+            bands = list(Band.objects.order_by("name").prefetch_cluster())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                ["The Beatles member"], [m.name for m in bands[0].members.all()]
+            )
+            self.assertEqual(
+                [["Song 0"], ["Song 1"]],
+                [
+                    [song.name for song in album.songs.all()]
+                    for album in bands[1].albums.all()
+                ],
+            )
+
+    def test_prefetch_cluster_with_depth(self):
+        with self.assertNumQueries(3):
+            bands = list(Band.objects.prefetch_cluster(depth=1))
+
+        with self.assertNumQueries(1):
+            list(bands[0].albums.all()[0].songs.all())
+
+
+class PrefetchedObjectListTest(TestCase):
+    def setUp(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+            ],
+        )
+        beatles.save()
+        self.beatles = Band.objects.prefetch_related("members").get(pk=beatles.pk)
+
+    def test_object_list_is_seeded_from_prefetched_objects(self):
+        with self.assertNumQueries(0):
+            self.beatles.members.add(BandMember(name="George Harrison"))
+            self.assertEqual(3, len(self.beatles.members.get_object_list()))
+
+        # the live objects are known from the prefetched ones, so nothing is
+        # queried before writing the members. The prefetched members may have
+        # been modified since they were loaded, so they are saved in full: two
+        # updates and an insert
+        with self.assertNumQueries(3):
+            self.beatles.members.commit()
+
+    def test_prefetched_objects_are_discarded_on_commit(self):
+        self.beatles.members.add(BandMember(name="George Harrison"))
+        self.beatles.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(3, self.beatles.members.count())
+
+    def test_parental_many_to_many_is_seeded_from_prefetched_objects(self):
+        author_1 = Author.objects.create(name="Author 1")
+        author_2 = Author.objects.create(name="Author 2")
+        article = Article(title="Test Title", authors=[author_1])
+        article.save()
+        article = Article.objects.prefetch_related("authors").get(pk=article.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual([author_1], article.authors.get_object_list())
+        article.authors.add(author_2)
+        article.save()
+
+        self.assertEqual([author_1, author_2], list(article.authors.order_by("name")))
+
+
+class AutoPrefetchTest(TestCase):
+    def setUp(self):
+        for i in range(3):
+            playlist = Playlist.objects.create(name="Playlist %d" % i)
+            PlaylistFollower.objects.create(playlist=playlist, name="Follower %d" % i)
+
+    def test_relation_is_loaded_for_all_siblings(self):
+        playlists = list(Playlist.objects.order_by("name"))
+
+        with self.assertNumQueries(1):
+            names = [
+                [follower.name for follower in playlist.followers.all()]
+                for playlist in playlists
+            ]
+        self.assertEqual([["Follower 0"], ["Follower 1"], ["Follower 2"]], names)
+
+        # relations without auto_prefetch are still loaded per instance
+        with self.assertNumQueries(3):
+            for playlist in playlists:
+                list(playlist.entries.all())
+
+    def test_in_memory_siblings_are_not_reloaded(self):
+        playlists = list(Playlist.objects.order_by("name"))
+        playlists[1].followers = [PlaylistFollower(name="New follower")]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(1, playlists[0].followers.count())
+        self.assertFalse(hasattr(playlists[1], "_prefetched_objects_cache"))
+        self.assertEqual(
+            ["New follower"],
+            [follower.name for follower in playlists[1].followers.all()],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(1, playlists[2].followers.count())
+
+    def test_instances_loaded_singly_are_unaffected(self):
+        playlist = Playlist.objects.get(name="Playlist 0")
+        self.assertNotIn("_cluster_siblings", playlist.__dict__)
+        self.assertEqual(1, playlist.followers.count())
+
+    def test_instance_with_siblings_can_be_copied(self):
+        playlist = Playlist.objects.order_by("name")[:2][0]
+        playlist_copy = pickle.loads(pickle.dumps(playlist))
+        self.assertNotIn("_cluster_siblings", playlist_copy.__dict__)
+        self.assertEqual(1, playlist_copy.followers.count())
+
+
+class FieldValueGetterTest(TestCase):
+    def test_getter_matches_extract_field_value(self):
+        beatles = Band(name="The Beatles")
+        album = Album(
+            band=beatles,
+            name="Please Please Me",
+            release_date=datetime.date(1963, 3, 22),
+        )
+        for key in ["name", "band", "band__name", "release_date__year", "pk"]:
+            self.assertEqual(
+                extract_field_value(album, key), get_field_value_getter(key)(album)
+            )
+
+    def test_null_relationship(self):
+        member = BandMember(name="John Lennon")
+        self.assertIs(
+            NULL_RELATIONSHIP_VALUE,
+            get_field_value_getter("favourite_restaurant__name")(member),
+        )
+        self.assertIsNone(get_field_value_getter("favourite_restaurant")(member))
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(FieldDoesNotExist):
+            get_field_value_getter("name__nonexistent")(BandMember(name="John Lennon"))
+
+
+class FilterEvaluationTest(TestCase):
+    def test_tests_run_cheapest_first_and_stop_when_result_is_known(self):
+        calls = []
+
+        def make_test(name, result):
+            def test(obj):
+                calls.append(name)
+                return result
+
+            return test
+
+        _, test = _combine_test_functions(
+            [(5, make_test("regex", True)), (1, make_test("exact", False))]
+        )
+        self.assertFalse(test(None))
+        self.assertEqual(["exact"], calls)
+
+        calls.clear()
+        _, test = _combine_test_functions(
+            [(5, make_test("regex", False)), (1, make_test("exact", True))],
+            connector=Q.OR,
+        )
+        self.assertTrue(test(None))
+        self.assertEqual(["exact"], calls)
+
+    def test_combined_q_objects(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+                BandMember(name="George Harrison"),
+            ],
+        )
+
+        def names(queryset):
+            return [member.name for member in queryset]
+
+        self.assertEqual(
+            ["John Lennon", "George Harrison"],
+            names(
+                beatles.members.filter(
+                    Q(name__iregex=r"^j") | Q(name__endswith="Harrison")
+                )
+            ),
+        )
+        self.assertEqual(
+            ["Paul McCartney"],
+            names(beatles.members.filter(~Q(name__contains="o"))),
+        )
+        self.assertEqual(
+            ["Paul McCartney", "George Harrison"],
+            names(
+                beatles.members.filter(
+                    Q(name__contains="Lennon") ^ Q(name__contains="n")
+                )
+            ),
+        )
+        self.assertEqual(
+            ["Paul McCartney"],
+            names(
+                beatles.members.exclude(
+                    Q(name__startswith="J"), name__contains="o"
+                ).exclude(name="George Harrison")
+            ),
+        )
+
+
+class IndexedLookupTest(TestCase):
+    def setUp(self):
+        self.playlist = Playlist(
+            name="Road trip",
+            followers=[
+                PlaylistFollower(id=1, name="John Lennon"),
+                PlaylistFollower(id=2, name="Paul McCartney"),
+                PlaylistFollower(id=3, name="George Harrison"),
+            ],
+        )
+
+    def test_pk_lookups_find_objects_saved_after_indexing(self):
+        beatles = Band(
+            name="The Beatles", members=[BandMember(id=1, name="John Lennon")]
+        )
+        self.assertEqual({"pk", "id"}, beatles.members.all().indexes.field_names)
+
+        member = BandMember(name="Paul McCartney")
+        beatles.members.add(member)
+        self.assertEqual([member], list(beatles.members.filter(id=None)))
+        self.assertEqual(
+            ["John Lennon"], [m.name for m in beatles.members.filter(pk__gt=0)]
+        )
+        # as if saved directly, rather than through the parent
+        member.id = 2
+        self.assertEqual(member, beatles.members.get(id=2))
+        self.assertEqual([member], list(beatles.members.filter(id__in=[2, 3])))
+        self.assertEqual([member], list(beatles.members.filter(pk__gt=1)))
+        self.assertEqual([], list(beatles.members.filter(pk=None)))
+
+    def test_pk_lookups_use_index(self):
+        followers = self.playlist.followers.all()
+        self.assertEqual("Paul McCartney", followers.get(pk=2).name)
+        self.assertEqual("Paul McCartney", followers.get(id="2").name)
+        self.assertIn("pk", followers.indexes.indexes)
+        self.assertIs(followers.indexes, followers.all().indexes)
+
+        self.assertEqual(
+            ["John Lennon", "George Harrison"],
+            [follower.name for follower in followers.filter(pk__in=[3, 1, 3])],
+        )
+        self.assertEqual(
+            ["George Harrison"],
+            [
+                follower.name
+                for follower in followers.filter(
+                    pk__in=[1, 3], name__contains="o", id__gt=1
+                )
+            ],
+        )
+        with self.assertRaises(PlaylistFollower.DoesNotExist):
+            followers.get(pk=4)
+
+    def test_one_shot_iterables(self):
+        followers = self.playlist.followers.all()
+        self.assertEqual(
+            ["John Lennon", "George Harrison"],
+            [
+                follower.name
+                for follower in followers.filter(id__in=(i for i in [1, 3]))
+            ],
+        )
+        self.assertEqual(
+            ["Paul McCartney"],
+            [follower.name for follower in followers.filter(pk__in=map(int, ["2"]))],
+        )
+        self.assertEqual("Paul McCartney", followers.get(pk__in=iter([2])).name)
+        self.assertEqual(
+            ["Paul McCartney", "George Harrison"],
+            [follower.name for follower in followers.filter(pk__range=iter([2, 3]))],
+        )
+
+    def test_index_is_rebuilt_when_relation_changes(self):
+        followers = self.playlist.followers.all()
+        followers.get(pk=1)
+
+        self.playlist.followers.add(PlaylistFollower(id=4, name="Ringo Starr"))
+        self.playlist.followers.remove(followers.get(pk=1))
+        self.assertEqual("Ringo Starr", followers.get(pk=4).name)
+        with self.assertRaises(PlaylistFollower.DoesNotExist):
+            followers.get(pk=1)
+
+    def test_get_stops_at_second_match(self):
+        self.playlist.followers.add(
+            PlaylistFollower(name="Pete Best"),
+            PlaylistFollower(name="Stuart Sutcliffe"),
+        )
+        with self.assertRaises(PlaylistFollower.MultipleObjectsReturned):
+            self.playlist.followers.get(pk=None)
+
+    def test_parental_many_to_many_lookup(self):
+        author = Author.objects.create(name="Author 1")
+        article = Article(title="Test Title", authors=[author])
+        self.assertEqual(author, article.authors.get(pk=author.pk))
+
+    def test_cluster_index_fields(self):
+        followers = self.playlist.followers.all()
+        self.assertEqual(3, followers.get(name="George Harrison").id)
+        self.assertEqual(["name"], list(followers.indexes.indexes))
+
+    def test_range_lookups_use_sorted_index(self):
+        self.playlist.followers.add(PlaylistFollower(name="Ringo Starr"))
+        followers = self.playlist.followers.all()
+        self.assertEqual(
+            ["Paul McCartney", "George Harrison"],
+            [follower.name for follower in followers.filter(pk__gt=1)],
+        )
+        self.assertIn("pk", followers.indexes.sorted_indexes)
+        self.assertEqual(
+            ["John Lennon", "Paul McCartney"],
+            [follower.name for follower in followers.filter(id__lte="2")],
+        )
+        self.assertEqual(
+            ["Paul McCartney"],
+            [follower.name for follower in followers.filter(pk__range=(2, 2))],
+        )
+        self.assertEqual(
+            ["George Harrison"],
+            [
+                follower.name
+                for follower in followers.filter(pk__gte=2, name__contains="o")
+            ],
+        )
+        self.assertEqual([], list(followers.filter(pk__lt=1)))
+
+    def test_sorted_index_is_rebuilt_when_relation_is_sorted(self):
+        playlist = Playlist(
+            name="Road trip",
+            entries=[PlaylistEntry(id=1, title="Entry 1", sort_order=1)],
+        )
+        entries = playlist.entries.all()
+        playlist.entries.add(
+            PlaylistEntry(id=3, title="Entry 3", sort_order=0),
+            PlaylistEntry(id=2, title="Entry 2", sort_order=2),
+        )
+        self.assertEqual(
+            ["Entry 3"], [entry.title for entry in entries.filter(pk__gt=2)]
+        )
+
+        # reading the relation sorts the shared object list in place
+        playlist.entries.all()
+        self.assertEqual(
+            ["Entry 3"], [entry.title for entry in entries.filter(pk__gt=2)]
+        )
+        self.assertEqual(
+            ["Entry 1", "Entry 2"],
+            [entry.title for entry in entries.filter(pk__range=(1, 2))],
+        )
+
+
+class RelationGenerationTest(TestCase):
+    def test_relation_generation(self):
+        beatles = Band(name="The Beatles")
+        self.assertEqual(0, beatles.relation_generation("members"))
+
+        beatles.members = [BandMember(name="John Lennon")]
+        generation = beatles.relation_generation("members")
+        self.assertGreater(generation, 0)
+
+        # reading the relation does not change the generation
+        list(beatles.members.all())
+        self.assertEqual(generation, beatles.relation_generation("members"))
+        self.assertEqual(0, beatles.relation_generation("albums"))
+
+        for modify in [
+            lambda: beatles.members.add(BandMember(name="Paul McCartney")),
+            lambda: beatles.members.create(name="George Harrison"),
+            lambda: beatles.members.remove(beatles.members.get(name="John Lennon")),
+            lambda: beatles.members.clear(),
+            lambda: beatles.save(),
+        ]:
+            modify()
+            self.assertGreater(beatles.relation_generation("members"), generation)
+            generation = beatles.relation_generation("members")
+
+    def test_parental_many_to_many_generation(self):
+        author = Author.objects.create(name="Author 1")
+        article = Article(title="Test Title")
+        article.authors = [author]
+        generation = article.relation_generation("authors")
+        self.assertGreater(generation, 0)
+
+        article.authors.remove(author)
+        self.assertGreater(article.relation_generation("authors"), generation)
+
+    def test_cluster_generation_includes_nested_relations(self):
+        album = Album(name="Please Please Me", songs=[Song(name="Misery")])
+        beatles = Band(name="The Beatles", albums=[album])
+        generation = beatles.cluster_generation()
+        self.assertEqual(beatles.relation_generation("albums"), generation)
+
+        album.songs.add(Song(name="Anna (Go To Him)"))
+        self.assertGreater(beatles.cluster_generation(), generation)
+        generation = beatles.cluster_generation()
+
+        beatles.albums.remove(album)
+        self.assertGreater(beatles.cluster_generation(), generation)
+
+
+class SortByFieldsTest(TestCase):
+    def setUp(self):
+        parlophone = RecordLabel(id=1, name="Parlophone", range=2)
+        apple = RecordLabel(id=2, name="Apple", range=1)
+        self.albums = [
+            Album(id=1, name="Help!", sort_order=2, label=parlophone),
+            Album(id=2, name="Abbey Road", sort_order=None, label=apple),
+            Album(id=3, name="Let It Be", sort_order=2, label=apple),
+            Album(id=4, name="Rubber Soul", sort_order=1, label=None),
+        ]
+
+    def assertSortedIds(self, expected_ids, fields):
+        items = list(self.albums)
+        sort_by_fields(items, fields)
+        self.assertEqual(expected_ids, [album.id for album in items])
+
+    def test_single_field(self):
+        # None sorts before other values, and ties keep their original order
+        self.assertSortedIds([2, 4, 1, 3], ["sort_order"])
+        self.assertSortedIds([1, 3, 4, 2], ["-sort_order"])
+        self.assertSortedIds([2, 1, 3, 4], ["name"])
+
+    def test_mixed_directions(self):
+        self.assertSortedIds([2, 4, 3, 1], ["sort_order", "-name"])
+        self.assertSortedIds([3, 1, 4, 2], ["-sort_order", "-pk"])
+        self.assertSortedIds([1, 3, 4, 2], ["-sort_order", "name"])
+
+    def test_related_fields(self):
+        # related objects sort by pk, and null relationships as None
+        self.assertSortedIds([4, 1, 2, 3], ["label"])
+        self.assertSortedIds([4, 3, 2, 1], ["label__range", "-sort_order"])
+        self.assertSortedIds([1, 3, 2, 4], ["-label__name", "-sort_order"])
+
+    def test_unknown_field(self):
+        self.assertSortedIds([1, 2, 3, 4], ["nonexistent", "name__nonexistent"])
+
+    def test_mixed_subclasses(self):
+        places = [
+            Restaurant(id=1, name="Pizzeria", serves_hot_dogs=True),
+            Place(id=2, name="Park"),
+            Restaurant(id=3, name="Diner", serves_hot_dogs=False),
+        ]
+        sort_by_fields(places, ["serves_hot_dogs", "name"])
+        self.assertEqual(["Park", "Diner", "Pizzeria"], [p.name for p in places])
+
+    def test_random_ordering(self):
+        # fields before '?' order the shuffled list; fields after it have no effect
+        items = list(self.albums)
+        sort_by_fields(items, ["sort_order", "?", "name"])
+        self.assertEqual([None, 1, 2, 2], [album.sort_order for album in items])
+
+
+class DeferredSortingTest(TestCase):
+    def test_sorting_is_deferred_until_relation_is_read(self):
+        beatles = Band(name="The Beatles")
+        for i in reversed(range(3)):
+            beatles.albums.add(Album(name="Album %d" % i, sort_order=i))
+
+        # the list is left in insertion order until it is read
+        self.assertEqual(
+            [2, 1, 0],
+            [album.sort_order for album in beatles._cluster_related_objects["albums"]],
+        )
+        self.assertEqual(
+            ["Album 0", "Album 1", "Album 2"],
+            [album.name for album in beatles.albums.all()],
+        )
+        self.assertEqual(
+            [0, 1, 2],
+            [album.sort_order for album in beatles._cluster_related_objects["albums"]],
+        )
+
+    def test_held_queryset_is_sorted_after_add(self):
+        album = Album(name="Please Please Me")
+        album.songs = [Song(name="Anna", sort_order=4)]
+        songs = album.songs.all()
+        album.songs.add(
+            Song(name="Boys", sort_order=3),
+            Song(name="I Saw Her Standing There", sort_order=1),
+        )
+
+        self.assertEqual(
+            ["I Saw Her Standing There", "Boys", "Anna"], [song.name for song in songs]
+        )
+        self.assertEqual("I Saw Her Standing There", songs.first().name)
+
+        album.songs.add(Song(name="Misery", sort_order=2))
+        self.assertEqual("Misery", songs[1].name)
+        self.assertEqual("Anna", songs.last().name)
+        self.assertEqual(
+            ["I Saw Her Standing There", "Misery", "Boys", "Anna"],
+            [song.name for song in songs.filter(sort_order__gte=1)],
+        )
+
+    def test_relation_is_sorted_before_commit(self):
+        beatles = Band(name="The Beatles")
+        beatles.save()
+        beatles.albums = [
+            Album(name="Album %d" % i, sort_order=i) for i in reversed(range(3))
+        ]
+        beatles.save()
+
+        albums = list(Album.objects.filter(band=beatles).order_by("pk"))
+        self.assertEqual([0, 1, 2], [album.sort_order for album in albums])
+
+
+class ObjectListHelpersTest(TestCase):
+    def test_replace_or_append_objects(self):
+        john = BandMember(pk=1, name="John Lennon")
+        paul = BandMember(name="Paul McCartney")
+        items = [john, paul]
+
+        new_john = BandMember(pk=1, name="John Winston Lennon")
+        ringo = BandMember(name="Ringo Starr")
+        # an unsaved object only matches itself
+        paul_copy = BandMember(name="Paul McCartney")
+        replace_or_append_objects(items, [new_john, ringo, paul, paul_copy, ringo])
+
+        self.assertEqual(4, len(items))
+        self.assertIs(new_john, items[0])
+        self.assertIs(paul, items[1])
+        self.assertIs(ringo, items[2])
+        self.assertIs(paul_copy, items[3])
+
+    def test_object_positions_notice_objects_saved_after_indexing(self):
+        paul = BandMember(name="Paul McCartney")
+        george = BandMember(name="George Harrison")
+        items = [paul, george]
+        positions = ObjectPositions(items)
+
+        george.pk = 3
+        new_george = BandMember(pk=3, name="George Harrison")
+        positions.replace_or_append([new_george])
+
+        self.assertEqual([paul, new_george], items)
+
+    def test_add_reuses_object_positions(self):
+        beatles = Band(name="The Beatles")
+        beatles.members.add(BandMember(name="John Lennon"))
+        positions = beatles._cluster_related_positions["members"][0]
+
+        paul = BandMember(name="Paul McCartney")
+        beatles.members.add(paul)
+        beatles.members.add(BandMember(name="George Harrison"))
+        self.assertIs(positions, beatles._cluster_related_positions["members"][0])
+
+        # the index is rebuilt once the list is modified in another way
+        beatles.members.remove(paul)
+        beatles.members.add(paul)
+        self.assertIsNot(positions, beatles._cluster_related_positions["members"][0])
+        self.assertEqual(
+            ["John Lennon", "George Harrison", "Paul McCartney"],
+            [member.name for member in beatles.members.all()],
+        )
+
+    def test_add_after_sorting_replaces_objects(self):
+        beatles = Band(name="The Beatles")
+        beatles.save()
+        beatles.albums.add(Album(name="Abbey Road", sort_order=2))
+        beatles.albums.add(Album(name="Please Please Me", sort_order=1))
+        beatles.save()
+        # reading the relation sorts it in place, moving the indexed objects
+        self.assertEqual(
+            ["Please Please Me", "Abbey Road"],
+            [album.name for album in beatles.albums.all()],
+        )
+
+        abbey_road = Album.objects.get(name="Abbey Road")
+        abbey_road.sort_order = 3
+        beatles.albums.add(abbey_road)
+
+        self.assertEqual(
+            ["Please Please Me", "Abbey Road"],
+            [album.name for album in beatles.albums.all()],
+        )
+        self.assertEqual(3, beatles.albums.get(name="Abbey Road").sort_order)
+
+    def test_remove_objects(self):
+        john = BandMember(pk=1, name="John Lennon")
+        paul = BandMember(name="Paul McCartney")
+        george = BandMember(pk=3, name="George Harrison")
+        items = [john, paul, george]
+        original_list = items
+
+        remove_objects(
+            items, [BandMember(pk=1), BandMember(name="Paul McCartney"), george]
+        )
+
+        self.assertIs(original_list, items)
+        self.assertEqual([paul], items)
+
 
 class ParentalM2MTest(TestCase):
     def setUp(self):
@@ -0,0 +1,782 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.models.signals import pre_save
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from modelcluster.utils import (
+    diff_object_lists,
+    get_changed_field_names,
+    get_field_values_snapshot,
+)
+
+from tests.models import (
+    Album,
+    Article,
+    Author,
+    Band,
+    BandMember,
+    Playlist,
+    PlaylistComment,
+    Restaurant,
+    Review,
+    Song,
+)
+
+
+class BulkCommitTest(TestCase):
+    def test_bulk_save_new_cluster(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+            ],
+            albums=[
+                Album(
+                    name="Please Please Me",
+                    sort_order=1,
+                    songs=[
+                        Song(name="I Saw Her Standing There", sort_order=1),
+                        Song(name="Misery", sort_order=2),
+                    ],
+                ),
+            ],
+        )
+        beatles.save(bulk=True)
+
+        # primary keys are populated on the in-memory objects
+        self.assertTrue(all(member.pk for member in beatles.members.all()))
+        please_please_me = beatles.albums.get()
+        self.assertIsNotNone(please_please_me.pk)
+
+        beatles = Band.objects.get(pk=beatles.pk)
+        self.assertEqual(
+            ["John Lennon", "Paul McCartney"],
+            sorted(member.name for member in beatles.members.all()),
+        )
+        self.assertEqual(
+            ["I Saw Her Standing There", "Misery"],
+            [song.name for song in beatles.albums.get().songs.all()],
+        )
+
+    def test_bulk_commit_applies_changes_in_one_query_per_operation(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+                BandMember(name="Pete Best"),
+            ],
+        )
+        beatles.save()
+
+        beatles = Band.objects.get(pk=beatles.pk)
+        john = beatles.members.get(name="John Lennon")
+        paul = beatles.members.get(name="Paul McCartney")
+        pete = beatles.members.get(name="Pete Best")
+        john.name = "John Winston Lennon"
+        beatles.members.add(john)
+        beatles.members.remove(pete)
+        beatles.members.add(BandMember(name="Ringo Starr"))
+        beatles.members.add(BandMember(name="George Harrison"))
+
+        # the live rows are known from get_object_list(), so this is just
+        # delete, bulk insert, bulk update
+        with self.assertNumQueries(3):
+            beatles.members.commit(bulk=True)
+
+        self.assertFalse(BandMember.objects.filter(pk=pete.pk).exists())
+        self.assertEqual(BandMember.objects.get(pk=john.pk).name, "John Winston Lennon")
+        self.assertEqual(BandMember.objects.get(pk=paul.pk).band, beatles)
+        self.assertEqual(
+            ["George Harrison", "John Winston Lennon", "Paul McCartney", "Ringo Starr"],
+            sorted(beatles.members.values_list("name", flat=True)),
+        )
+
+    def test_bulk_options_are_keyword_only(self):
+        beatles = Band(name="The Beatles", members=[BandMember(name="John Lennon")])
+        with self.assertRaises(TypeError):
+            beatles.save(True)
+        beatles.save()
+        with self.assertRaises(TypeError):
+            beatles.members.commit(True)
+
+    def test_bulk_commit_with_batch_size(self):
+        beatles = Band(name="The Beatles")
+        beatles.save()
+        beatles.members = [BandMember(name="Member %d" % i) for i in range(5)]
+
+        # select live primary keys, then three batches of inserts
+        with self.assertNumQueries(4):
+            beatles.members.commit(bulk=True, batch_size=2)
+
+        self.assertEqual(5, BandMember.objects.filter(band=beatles).count())
+
+    def test_bulk_commit_moves_object_from_other_parent(self):
+        beatles = Band(name="The Beatles", members=[BandMember(name="Pete Best")])
+        beatles.save()
+        pete = beatles.members.get()
+
+        all_stars = Band(name="Pete Best All-Stars")
+        all_stars.save()
+        all_stars.members.add(pete)
+        all_stars.save(bulk=True)
+
+        self.assertEqual(BandMember.objects.get(pk=pete.pk).band, all_stars)
+        self.assertEqual(0, Band.objects.get(pk=beatles.pk).members.count())
+
+
+@skipUnlessDBFeature("supports_update_conflicts_with_target")
+class UpsertCommitTest(TestCase):
+    def test_upsert_commit(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Pete Best"),
+            ],
+        )
+        beatles.save()
+
+        beatles = Band.objects.get(pk=beatles.pk)
+        john = beatles.members.get_object_list()[0]
+        john.name = "John Winston Lennon"
+        beatles.members.add(BandMember(name="Ringo Starr"))
+
+        # insert new members; upsert changed ones
+        with CaptureQueriesContext(connection) as context:
+            beatles.members.commit(upsert=True)
+
+        self.assertEqual(2, len(context.captured_queries))
+        self.assertIn("ON CONFLICT", context.captured_queries[1]["sql"])
+        self.assertEqual(
+            ["John Winston Lennon", "Pete Best", "Ringo Starr"],
+            sorted(
+                BandMember.objects.filter(band=beatles).values_list("name", flat=True)
+            ),
+        )
+
+    def test_upsert_moves_object_from_other_parent(self):
+        beatles = Band(name="The Beatles", members=[BandMember(name="Pete Best")])
+        beatles.save()
+        pete = beatles.members.get()
+
+        all_stars = Band(name="Pete Best All-Stars")
+        all_stars.save()
+        all_stars.members.add(pete)
+
+        # the object is upserted without checking whether it exists first
+        with self.assertNumQueries(1):
+            all_stars.members.commit(upsert=True)
+
+        self.assertEqual(BandMember.objects.get(pk=pete.pk).band, all_stars)
+        self.assertEqual(1, BandMember.objects.count())
+
+    def test_upsert_save_of_nested_cluster(self):
+        beatles = Band(
+            name="The Beatles",
+            albums=[
+                Album(
+                    name="Please Please Me",
+                    sort_order=1,
+                    songs=[Song(name="Misery", sort_order=1)],
+                ),
+            ],
+        )
+        beatles.save(upsert=True)
+
+        album = Band.objects.get(pk=beatles.pk).albums.get()
+        self.assertEqual(["Misery"], [song.name for song in album.songs.all()])
+
+
+class BulkClusterSaveTest(TestCase):
+    def test_nested_relations_are_inserted_in_one_query_per_level(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+            ],
+            albums=[
+                Album(
+                    name="Album %d" % i,
+                    sort_order=i,
+                    songs=[
+                        Song(name="Song %d.%d" % (i, j), sort_order=j) for j in range(3)
+                    ],
+                )
+                for i in range(3)
+            ],
+        )
+
+        # insert band; select live members and albums; insert members; insert albums;
+        # insert songs of all albums
+        with self.assertNumQueries(6):
+            beatles.save(bulk=True)
+
+        for i, album in enumerate(Band.objects.get(pk=beatles.pk).albums.all()):
+            self.assertEqual(
+                ["Song %d.%d" % (i, j) for j in range(3)],
+                [song.name for song in album.songs.all()],
+            )
+
+    def test_nested_changes_are_grouped_by_model(self):
+        beatles = Band(
+            name="The Beatles",
+            albums=[
+                Album(
+                    name="Album %d" % i,
+                    sort_order=i,
+                    songs=[
+                        Song(name="Song %d.%d" % (i, j), sort_order=j) for j in range(2)
+                    ],
+                )
+                for i in range(3)
+            ],
+        )
+        beatles.save()
+
+        beatles = Band.objects.get(pk=beatles.pk)
+        for album in beatles.albums.get_object_list():
+            songs = album.songs.get_object_list()
+            songs[0].name += " (Remastered)"
+            album.songs.remove(songs[1])
+            album.songs.add(Song(name="Bonus track", sort_order=2))
+
+        # update band; delete songs; insert songs; update songs
+        with self.assertNumQueries(4):
+            beatles.save(bulk=True)
+
+        for i, album in enumerate(Band.objects.get(pk=beatles.pk).albums.all()):
+            self.assertEqual(
+                ["Song %d.0 (Remastered)" % i, "Bonus track"],
+                [song.name for song in album.songs.all()],
+            )
+
+    def test_bulk_save_with_relations_inherited_from_superclass(self):
+        restaurant = Restaurant(
+            name="The Yellow Submarine",
+            reviews=[Review(author="Michael Winner", body="Rubbish.")],
+        )
+        restaurant.save(bulk=True)
+        self.assertEqual(1, Restaurant.objects.get(pk=restaurant.pk).reviews.count())
+
+
+class DirtyTrackingCommitTest(TestCase):
+    def setUp(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+                BandMember(name="George Harrison"),
+            ],
+            albums=[
+                Album(
+                    name="Please Please Me",
+                    sort_order=1,
+                    songs=[Song(name="Misery", sort_order=1)],
+                ),
+            ],
+        )
+        beatles.save()
+        self.beatles = Band.objects.get(pk=beatles.pk)
+
+    def test_unchanged_children_are_not_written(self):
+        members = self.beatles.members.get_object_list()
+        self.assertEqual(3, len(members))
+
+        # the live rows are known from get_object_list(), so no queries are needed
+        with self.assertNumQueries(0):
+            self.beatles.members.commit()
+
+    def test_live_rows_are_queried_when_not_loaded(self):
+        self.beatles.members = [BandMember(name="Ringo Starr")]
+
+        with CaptureQueriesContext(connection) as context:
+            self.beatles.members.commit()
+
+        # live primary keys are fetched without loading whole rows
+        self.assertNotIn(
+            '"tests_bandmember"."name"', context.captured_queries[0]["sql"]
+        )
+        self.assertEqual(
+            ["Ringo Starr"],
+            [
+                member.name
+                for member in Band.objects.get(pk=self.beatles.pk).members.all()
+            ],
+        )
+
+    def test_snapshot_is_not_reused_for_a_different_parent(self):
+        self.beatles.members.get_object_list()
+        self.beatles.pk = None
+        self.beatles.save()
+
+        # a new Band record is created with copies of the members
+        self.assertEqual(2, Band.objects.count())
+        self.assertEqual(3, Band.objects.get(pk=self.beatles.pk).members.count())
+
+    def test_only_changed_fields_are_written(self):
+        self.beatles.members.get_object_list()
+        john = self.beatles.members.get(name="John Lennon")
+        john.name = "John Winston Lennon"
+
+        with CaptureQueriesContext(connection) as context:
+            self.beatles.save()
+
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE") and "tests_bandmember" in query["sql"]
+        ]
+        self.assertEqual(1, len(updates))
+        self.assertIn('"name"', updates[0])
+        self.assertNotIn('"favourite_restaurant_id"', updates[0])
+        self.assertEqual("John Winston Lennon", BandMember.objects.get(pk=john.pk).name)
+
+    def test_in_place_changes_to_loaded_children_are_written_in_bulk(self):
+        self.beatles.members.get_object_list()
+        paul = self.beatles.members.get(name="Paul McCartney")
+        paul.name = "Sir Paul McCartney"
+
+        with CaptureQueriesContext(connection) as context:
+            self.beatles.members.commit(bulk=True)
+
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(1, len(updates))
+        self.assertEqual(1, updates[0].count("WHEN"))
+        self.assertEqual("Sir Paul McCartney", BandMember.objects.get(pk=paul.pk).name)
+
+    def test_in_place_changes_to_mutable_values_are_detected(self):
+        class Name:
+            def __init__(self, value):
+                self.value = value
+
+            def __eq__(self, other):
+                return isinstance(other, Name) and self.value == other.value
+
+        member = BandMember(id=1, name=Name("John Lennon"))
+        snapshot = get_field_values_snapshot(member)
+        self.assertEqual([], get_changed_field_names(member, snapshot))
+
+        member.name.value = "John Winston Lennon"
+        self.assertEqual(["name"], get_changed_field_names(member, snapshot))
+
+    def test_fields_set_by_pre_save_handlers_are_written(self):
+        def number_song(sender, instance, **kwargs):
+            instance.sort_order = len(instance.name)
+
+        album = self.beatles.albums.get()
+        song = album.songs.get_object_list()[0]
+        song.name = "Misery!"
+
+        pre_save.connect(number_song, sender=Song)
+        try:
+            album.songs.commit()
+        finally:
+            pre_save.disconnect(number_song, sender=Song)
+
+        self.assertEqual(7, Song.objects.get(pk=song.pk).sort_order)
+
+    def test_changed_fields_only_can_be_disabled(self):
+        self.beatles.members.get_object_list()
+
+        with mock.patch.object(
+            BandMember, "cluster_save_changed_fields_only", False, create=True
+        ):
+            with CaptureQueriesContext(connection) as context:
+                self.beatles.members.commit()
+
+        # every member is saved in full
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(3, len(updates))
+        self.assertIn('"favourite_restaurant_id"', updates[0])
+
+    def test_changes_to_prefetched_children_are_written(self):
+        # objects loaded by prefetch_related() may have been modified before the
+        # relation's object list is built from them
+        for add_edited_member in [True, False]:
+            beatles = Band.objects.prefetch_related("members").get(pk=self.beatles.pk)
+            john = beatles.members.all()[0]
+            john.name = "John %s" % add_edited_member
+            if add_edited_member:
+                beatles.members.add(john)
+            else:
+                beatles.members.add(BandMember(name="Ringo %s" % add_edited_member))
+            beatles.save()
+
+            self.assertEqual(
+                "John %s" % add_edited_member, BandMember.objects.get(pk=john.pk).name
+            )
+
+    def test_nested_relations_on_unchanged_children_are_committed(self):
+        self.beatles.albums.get_object_list()
+        album = self.beatles.albums.get()
+        album.songs.add(Song(name="Anna (Go To Him)", sort_order=2))
+
+        self.beatles.save()
+
+        self.assertEqual(
+            ["Misery", "Anna (Go To Him)"],
+            [song.name for song in Album.objects.get(pk=album.pk).songs.all()],
+        )
+
+
+class BatchedDeleteTest(TestCase):
+    def setUp(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[BandMember(name="Member %d" % i) for i in range(3)],
+            albums=[
+                Album(
+                    name="Album %d" % i,
+                    sort_order=i,
+                    songs=[
+                        Song(name="Song %d.%d" % (i, j), sort_order=j) for j in range(3)
+                    ],
+                )
+                for i in range(5)
+            ],
+        )
+        beatles.save()
+        self.beatles = Band.objects.get(pk=beatles.pk)
+
+    def test_removed_children_are_deleted_together(self):
+        self.beatles.albums.get_object_list()
+        self.beatles.albums.clear()
+
+        # select albums; delete their songs; delete albums
+        with self.assertNumQueries(3):
+            self.beatles.albums.commit()
+
+        self.assertEqual(0, Album.objects.count())
+        self.assertEqual(0, Song.objects.count())
+
+    def test_bulk_commit_deletes_removed_children_of_all_relations_together(self):
+        self.beatles.members.get_object_list()
+        self.beatles.albums.get_object_list()
+        self.beatles.members.clear()
+        self.beatles.albums.clear()
+
+        with CaptureQueriesContext(connection) as context:
+            self.beatles.save(bulk=True)
+
+        deletes = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("DELETE")
+        ]
+        self.assertEqual(3, len(deletes))
+        self.assertEqual(0, BandMember.objects.count())
+        self.assertEqual(0, Album.objects.count())
+        self.assertEqual(0, Song.objects.count())
+
+
+class OverlayCommitTest(TestCase):
+    def setUp(self):
+        playlist = Playlist.objects.create(name="Road trip")
+        PlaylistComment.objects.bulk_create(
+            [
+                PlaylistComment(playlist=playlist, text="Great"),
+                PlaylistComment(playlist=playlist, text="Too long"),
+            ]
+        )
+        self.playlist = Playlist.objects.get(pk=playlist.pk)
+
+    def get_live_texts(self, playlist):
+        return list(
+            PlaylistComment.objects.filter(playlist=playlist)
+            .order_by("text")
+            .values_list("text", flat=True)
+        )
+
+    def test_appending_a_child_only_inserts_it(self):
+        with self.assertNumQueries(0):
+            self.playlist.comments.add(PlaylistComment(text="Needs more jazz"))
+        self.assertTrue(self.playlist.comments.is_deferring)
+
+        with self.assertNumQueries(1):
+            self.playlist.comments.commit()
+
+        self.assertFalse(self.playlist.comments.is_deferring)
+        self.assertEqual(
+            ["Great", "Needs more jazz", "Too long"],
+            self.get_live_texts(self.playlist),
+        )
+
+    def test_removed_children_are_deleted_by_primary_key(self):
+        great = PlaylistComment.objects.get(text="Great")
+        other_playlist = Playlist.objects.create(name="Other")
+        other_comment = PlaylistComment.objects.create(
+            playlist=other_playlist, text="Not on this playlist"
+        )
+
+        with self.assertNumQueries(0):
+            self.playlist.comments.remove(great, other_comment)
+            self.playlist.comments.create(text="Short and sweet")
+
+        with self.assertNumQueries(2):
+            self.playlist.save(update_fields=["comments"])
+
+        self.assertEqual(
+            ["Short and sweet", "Too long"], self.get_live_texts(self.playlist)
+        )
+        # objects outside the relation are not deleted
+        self.assertTrue(PlaylistComment.objects.filter(pk=other_comment.pk).exists())
+
+    def test_added_object_replaces_existing_one(self):
+        great = PlaylistComment.objects.get(text="Great")
+        great.text = "Greatest"
+        self.playlist.comments.remove(great)
+        self.playlist.comments.add(great)
+        self.playlist.save()
+
+        self.assertEqual(["Greatest", "Too long"], self.get_live_texts(self.playlist))
+
+    def test_reading_the_relation_applies_the_overlay(self):
+        great = PlaylistComment.objects.get(text="Great")
+        self.playlist.comments.remove(great)
+        self.playlist.comments.add(PlaylistComment(text="Awful"))
+
+        self.assertEqual(
+            ["Awful", "Too long"],
+            [comment.text for comment in self.playlist.comments.all()],
+        )
+        # changes made after loading go to the object list as usual
+        self.playlist.comments.add(PlaylistComment(text="Wonderful"))
+        self.assertEqual(3, self.playlist.comments.count())
+
+        self.playlist.save()
+        self.assertEqual(
+            ["Awful", "Too long", "Wonderful"], self.get_live_texts(self.playlist)
+        )
+
+    def test_set_replaces_the_overlay(self):
+        self.playlist.comments.add(PlaylistComment(text="Awful"))
+        self.playlist.comments = [PlaylistComment(text="Wonderful")]
+        self.playlist.save()
+
+        self.assertEqual(["Wonderful"], self.get_live_texts(self.playlist))
+
+    def test_unsaved_parent_does_not_use_an_overlay(self):
+        playlist = Playlist(name="New")
+        playlist.comments.add(PlaylistComment(text="First"))
+        self.assertEqual(
+            ["First"],
+            [comment.text for comment in playlist.comments.get_object_list()],
+        )
+        playlist.save()
+        self.assertEqual(["First"], self.get_live_texts(playlist))
+
+    def test_bulk_commit_only_looks_up_the_changed_children(self):
+        great = PlaylistComment.objects.get(text="Great")
+        self.playlist.comments.remove(great)
+        self.playlist.comments.add(PlaylistComment(text="Awful"))
+
+        with CaptureQueriesContext(connection) as context:
+            self.playlist.comments.commit(bulk=True)
+
+        # look up the removed primary key, then delete it and insert the new object
+        self.assertEqual(3, len(context.captured_queries))
+        self.assertEqual(["Awful", "Too long"], self.get_live_texts(self.playlist))
+
+    async def test_acommit_overlay(self):
+        self.playlist.comments.add(PlaylistComment(text="Needs more jazz"))
+        await self.playlist.comments.acommit()
+
+        self.assertEqual(
+            3,
+            await PlaylistComment.objects.filter(playlist=self.playlist).acount(),
+        )
+
+
+class DiffObjectListsTest(TestCase):
+    def test_diff_object_lists(self):
+        john = BandMember(pk=1, name="John Lennon")
+        paul = BandMember(pk=2, name="Paul McCartney")
+        ringo = BandMember(name="Ringo Starr")
+        george = BandMember(pk=4, name="George Harrison")
+
+        pks_to_delete, items_to_create, items_to_update = diff_object_lists(
+            {1, 2, 3}, [john, paul, ringo, george]
+        )
+        self.assertEqual([3], pks_to_delete)
+        self.assertEqual([ringo, george], items_to_create)
+        self.assertEqual([john, paul], items_to_update)
+
+    def test_unsaved_objects_are_always_created(self):
+        ringo = BandMember(name="Ringo Starr")
+
+        pks_to_delete, items_to_create, items_to_update = diff_object_lists(
+            set(), [ringo, ringo]
+        )
+        self.assertEqual([], pks_to_delete)
+        self.assertEqual([ringo, ringo], items_to_create)
+        self.assertEqual([], items_to_update)
+
+
+class ParentalManyToManyCommitTest(TestCase):
+    def test_loaded_relation_is_committed_without_querying_live_objects(self):
+        author_1 = Author.objects.create(name="Author 1")
+        author_2 = Author.objects.create(name="Author 2")
+        author_3 = Author.objects.create(name="Author 3")
+        article = Article(title="Test Title", authors=[author_1, author_2])
+        article.save()
+
+        article = Article.objects.get(pk=article.pk)
+        article.authors.remove(author_1)
+        article.authors.add(author_3)
+
+        # delete, then insert of through records
+        with self.assertNumQueries(2):
+            article.authors.commit()
+
+        self.assertEqual(
+            ["Author 2", "Author 3"],
+            [
+                author.name
+                for author in Article.objects.get(pk=article.pk).authors.all()
+            ],
+        )
+
+    def test_live_relations_are_read_from_through_table(self):
+        authors = [Author.objects.create(name="Author %d" % i) for i in range(4)]
+        article = Article(title="Test Title", authors=authors[:3])
+        article.save()
+
+        article = Article.objects.get(pk=article.pk)
+        article.authors = authors[1:]
+
+        # select related pks from the through table; delete; insert
+        with CaptureQueriesContext(connection) as context:
+            article.authors.commit()
+
+        self.assertEqual(3, len(context.captured_queries))
+        select_sql = context.captured_queries[0]["sql"]
+        self.assertIn('FROM "tests_article_authors"', select_sql)
+        self.assertNotIn('"tests_author"', select_sql)
+        self.assertEqual(
+            ["Author 1", "Author 2", "Author 3"],
+            [
+                author.name
+                for author in Article.objects.get(pk=article.pk).authors.all()
+            ],
+        )
+
+
+class AsyncCommitTest(TestCase):
+    async def test_asave_new_cluster(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Paul McCartney"),
+            ],
+            albums=[
+                Album(
+                    name="Please Please Me",
+                    sort_order=1,
+                    songs=[
+                        Song(name="I Saw Her Standing There", sort_order=1),
+                        Song(name="Misery", sort_order=2),
+                    ],
+                ),
+            ],
+        )
+        await beatles.asave()
+
+        self.assertFalse(beatles.members.is_deferring)
+        beatles = await Band.objects.aget(pk=beatles.pk)
+        members = await beatles.members.aget_object_list()
+        self.assertEqual(
+            ["John Lennon", "Paul McCartney"], sorted(member.name for member in members)
+        )
+        albums = await beatles.albums.aget_object_list()
+        songs = await albums[0].songs.aget_object_list()
+        self.assertEqual(
+            ["I Saw Her Standing There", "Misery"], [song.name for song in songs]
+        )
+
+    async def test_asave_without_committing_relations(self):
+        beatles = Band(name="The Beatles", members=[BandMember(name="John Lennon")])
+        await beatles.asave(commit_relations=False)
+
+        self.assertTrue(beatles.members.is_deferring)
+        self.assertEqual(0, await BandMember.objects.filter(band=beatles).acount())
+
+        with self.assertRaises(TypeError):
+            await beatles.asave(True)
+        with self.assertRaises(TypeError):
+            await beatles.members.acommit(True)
+
+    async def test_acommit_changes(self):
+        beatles = Band(
+            name="The Beatles",
+            members=[
+                BandMember(name="John Lennon"),
+                BandMember(name="Pete Best"),
+            ],
+        )
+        await beatles.asave()
+
+        beatles = await Band.objects.aget(pk=beatles.pk)
+        john, pete = await beatles.members.aget_object_list()
+        john.name = "John Winston Lennon"
+        beatles.members.remove(pete)
+        beatles.members.add(BandMember(name="Ringo Starr"))
+        await beatles.members.acommit()
+
+        self.assertFalse(beatles.members.is_deferring)
+        self.assertEqual(
+            ["John Winston Lennon", "Ringo Starr"],
+            sorted(
+                [
+                    name
+                    async for name in BandMember.objects.filter(
+                        band=beatles
+                    ).values_list("name", flat=True)
+                ]
+            ),
+        )
+
+    async def test_asave_bulk(self):
+        beatles = Band(
+            name="The Beatles",
+            albums=[
+                Album(
+                    name="Album %d" % i,
+                    sort_order=i,
+                    songs=[Song(name="Song %d" % i, sort_order=1)],
+                )
+                for i in range(3)
+            ],
+        )
+        await beatles.asave(bulk=True)
+
+        self.assertEqual(3, await Album.objects.filter(band=beatles).acount())
+        self.assertEqual(3, await Song.objects.filter(album__band=beatles).acount())
+
+    async def test_acommit_parental_many_to_many(self):
+        author_1 = await Author.objects.acreate(name="Author 1")
+        author_2 = await Author.objects.acreate(name="Author 2")
+        article = Article(title="Test Title", authors=[author_1])
+        await article.asave()
+
+        article = await Article.objects.aget(pk=article.pk)
+        authors = await article.authors.aget_object_list()
+        self.assertEqual([author_1], authors)
+        article.authors = [author_2]
+        await article.authors.acommit()
+
+        self.assertEqual([author_2], [author async for author in article.authors.all()])
@@ -1,12 +1,25 @@
 from __future__ import unicode_literals
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from modelcluster.forms import (
     ClusterForm,
     transientmodelformset_factory,
     childformset_factory,
 )
-from tests.models import NewsPaper, Article, Author, Band, BandMember, Album, Song
+from modelcluster.utils import get_gapped_sort_order_values
+from tests.models import (
+    NewsPaper,
+    Article,
+    Author,
+    Band,
+    BandMember,
+    Album,
+    Song,
+    Playlist,
+    PlaylistEntry,
+)
 
 
 class TransientFormsetTest(TestCase):
@@ -479,6 +492,101 @@ class OrderedFormsetTest(TestCase):
         self.assertEqual(["Please Please Me", "With The Beatles"], album_names)
 
 
+class GappedSortOrderFormsetTest(TestCase):
+    def setUp(self):
+        self.playlist = Playlist(
+            name="Side A",
+            entries=[
+                PlaylistEntry(title="Track %d" % i, sort_order=(i + 1) * 100)
+                for i in range(5)
+            ],
+        )
+        self.playlist.save()
+        self.entries = list(self.playlist.entries.all())
+        self.EntriesFormset = childformset_factory(
+            Playlist, PlaylistEntry, extra=1, fields=["title"]
+        )
+
+    def get_formset_data(self, entries, new_titles=()):
+        data = {
+            "form-TOTAL_FORMS": len(entries) + len(new_titles),
+            "form-INITIAL_FORMS": len(entries),
+            "form-MAX_NUM_FORMS": 1000,
+        }
+        for i, entry in enumerate(self.entries):
+            data["form-%d-id" % i] = entry.pk
+            data["form-%d-title" % i] = entry.title
+            data["form-%d-ORDER" % i] = entries.index(entry) + 1
+        for i, title in enumerate(new_titles, start=len(entries)):
+            data["form-%d-id" % i] = ""
+            data["form-%d-title" % i] = title
+            data["form-%d-ORDER" % i] = i + 1
+        return data
+
+    def test_moving_one_entry_only_renumbers_that_entry(self):
+        reordered = [self.entries[4]] + self.entries[:4]
+        formset = self.EntriesFormset(
+            self.get_formset_data(reordered), instance=self.playlist
+        )
+        self.assertTrue(formset.is_valid())
+
+        with CaptureQueriesContext(connection) as context:
+            formset.save()
+
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(1, len(updates))
+
+        self.assertEqual(
+            ["Track 4", "Track 0", "Track 1", "Track 2", "Track 3"],
+            [entry.title for entry in self.playlist.entries.all()],
+        )
+        self.assertEqual(
+            [100, 200, 300, 400],
+            [
+                entry.sort_order
+                for entry in PlaylistEntry.objects.exclude(title="Track 4")
+            ],
+        )
+
+    def test_new_entries_are_appended_after_the_last_gap(self):
+        formset = self.EntriesFormset(
+            self.get_formset_data(self.entries, new_titles=["Track 5"]),
+            instance=self.playlist,
+        )
+        self.assertTrue(formset.is_valid())
+        formset.save()
+
+        self.assertEqual(600, PlaylistEntry.objects.get(title="Track 5").sort_order)
+        self.assertEqual(
+            [100, 200, 300, 400, 500, 600],
+            [entry.sort_order for entry in self.playlist.entries.all()],
+        )
+
+
+class GetGappedSortOrderValuesTest(TestCase):
+    def test_values_are_only_changed_where_needed(self):
+        self.assertEqual(
+            [10, 20, 30, 40], get_gapped_sort_order_values([10, 20, 30, 40], 10)
+        )
+        self.assertEqual(
+            [4, 10, 20, 30], get_gapped_sort_order_values([40, 10, 20, 30], 10)
+        )
+        self.assertEqual(
+            [10, 13, 16, 20],
+            get_gapped_sort_order_values([10, None, None, 20], 10),
+        )
+        self.assertEqual(
+            [20, 30, 40], get_gapped_sort_order_values([20, None, None], 10)
+        )
+
+    def test_values_are_rebalanced_when_gaps_run_out(self):
+        self.assertEqual([10, 20, 30], get_gapped_sort_order_values([10, None, 11], 10))
+
+
 class NestedChildFormsetTest(TestCase):
     def test_can_create_formset(self):
         beatles = Band(